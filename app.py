@@ -1,106 +1,278 @@
 import streamlit as st
 from audio_recorder_streamlit import audio_recorder
-import tempfile
 import os
-import base64
+import queue
+import threading
 import time
-from stt import transcribe
-from llm import krishna_reply
-from tts import speak
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import intent_classifier
+import tracing
+import audio_delivery
+from stt import transcribe, warm_up, warm_up_pool
+from stt_stream import StreamingTranscriber
+from llm import krishna_reply, krishna_reply_stream, CANNED_REPLIES, LOCAL_INTENT_ENABLED
+from llm_async import krishna_reply_concurrent
+from tts import audio_duration, speak_bytes, speak_stream, warm_cache, mime_type, OUTPUT_FORMAT, MOBILE_OUTPUT_FORMAT
+
+try:
+    from streamlit_webrtc import WebRtcMode, webrtc_streamer
+except ImportError:
+    webrtc_streamer = None
+
+STREAM_REPLY = os.getenv("KRISHNA_STREAM_REPLY", "1") != "0"
+ASYNC_REPLY = os.getenv("KRISHNA_ASYNC_REPLY", "0") == "1"
+WHISPER_WARMUP = os.getenv("KRISHNA_WHISPER_WARMUP", "1") != "0"
+STREAM_STT = os.getenv("KRISHNA_STREAM_STT", "0") == "1"
+TTS_STREAM_WORKERS = 2
+SENTENCE_GAP_SECONDS = float(os.getenv("KRISHNA_SENTENCE_GAP", "0.2"))
+MOBILE_USER_AGENT_MARKERS = ("Mobile", "Android", "iPhone", "iPad")
+
+@st.cache_resource(show_spinner=False)
+def _start_tts_cache_warmup():
+    def warm():
+        try:
+            warm_cache(CANNED_REPLIES, [OUTPUT_FORMAT, MOBILE_OUTPUT_FORMAT])
+        except Exception:
+            pass
+    thread = threading.Thread(target=warm, daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource(show_spinner=False)
+def _start_intent_warmup():
+    return intent_classifier.warm_up()
+
+@st.cache_resource(show_spinner=False)
+def _start_audio_server():
+    try:
+        return audio_delivery.start_server()
+    except OSError:
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _start_metrics_server():
+    try:
+        return tracing.serve_metrics()
+    except OSError:
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _start_whisper_warmup():
+    def warm():
+        try:
+            warm_up()
+        except Exception:
+            pass
+        try:
+            warm_up_pool()
+        except Exception:
+            pass
+    thread = threading.Thread(target=warm, daemon=True)
+    thread.start()
+    return thread
+
+def _client_output_format():
+    try:
+        user_agent = st.context.headers.get("User-Agent", "")
+    except Exception:
+        return OUTPUT_FORMAT
+    if any(marker in user_agent for marker in MOBILE_USER_AGENT_MARKERS):
+        return MOBILE_OUTPUT_FORMAT
+    return OUTPUT_FORMAT
+
+def _audio_base_url():
+    try:
+        headers = st.context.headers
+    except Exception:
+        headers = None
+    return audio_delivery.base_url(headers)
+
+def _synthesize(sentence, output_format, chunks):
+    try:
+        for chunk in speak_stream(sentence, output_format=output_format):
+            chunks.put(chunk)
+    finally:
+        chunks.put(None)
+
+def _play_sentence(audio_placeholder, audio_bytes, mime, output_format, play_until):
+    delay = play_until - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    audio_placeholder.audio(audio_bytes, format=mime, autoplay=True)
+    duration = audio_duration(audio_bytes, output_format)
+    return time.monotonic() + duration + SENTENCE_GAP_SECONDS if duration else 0.0
+
+def _stream_reply(text, reply_placeholder, output_format):
+    mime = mime_type(output_format)
+    segments = queue.Queue()
+    executor = ThreadPoolExecutor(max_workers=TTS_STREAM_WORKERS)
+    audio_stream = None
+    audio_base_url = _audio_base_url()
+    if audio_base_url and mime == "audio/mpeg":
+        audio_stream = audio_delivery.open_stream(mime, audio_base_url)
+        st.audio(audio_stream.url, format=mime, autoplay=True)
+    audio_placeholder = st.empty()
+
+    def produce():
+        try:
+            for sentence in krishna_reply_stream(text):
+                chunks = queue.Queue()
+                segments.put((sentence, chunks, executor.submit(tracing.wrap(_synthesize), sentence, output_format, chunks)))
+        except Exception as e:
+            segments.put(e)
+        finally:
+            segments.put(None)
+
+    threading.Thread(target=tracing.wrap(produce), daemon=True).start()
+    sentences = []
+    play_until = 0.0
+    tts_failed = False
+    try:
+        while True:
+            item = segments.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            sentence, chunks, future = item
+            sentences.append(sentence)
+            reply_placeholder.write(" ".join(sentences))
+            if tts_failed:
+                future.cancel()
+                continue
+            try:
+                audio_chunks = []
+                while True:
+                    chunk = chunks.get()
+                    if chunk is None:
+                        break
+                    if audio_stream is not None:
+                        audio_stream.write(chunk)
+                    audio_chunks.append(chunk)
+                future.result()
+                if audio_chunks and audio_stream is None:
+                    play_until = _play_sentence(audio_placeholder, b"".join(audio_chunks), mime, output_format, play_until)
+            except Exception as tts_error:
+                tts_failed = True
+                st.error(f"❌ Error during text-to-speech: {str(tts_error)}")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if audio_stream is not None:
+            audio_stream.close()
+    return " ".join(sentences)
+
+def _respond(text, output_format):
+    with st.expander("💬 What you said", expanded=False):
+        st.write(text)
+    with st.spinner("Krishna is thinking..."):
+        try:
+            if STREAM_REPLY:
+                with st.expander(" Krishna", expanded=False):
+                    reply_placeholder = st.empty()
+                with tracing.span("app.reply_and_tts", streaming=True):
+                    reply = _stream_reply(text, reply_placeholder, output_format)
+                if not reply or not reply.strip():
+                    st.warning("⚠️ No response generated. Please try again.")
+                return
+            with tracing.span("app.reply", engine="async" if ASYNC_REPLY else "sync"):
+                reply = krishna_reply_concurrent(text) if ASYNC_REPLY else krishna_reply(text)
+            if not reply or not reply.strip():
+                st.warning("⚠️ No response generated. Please try again.")
+                return
+            with st.expander(" Krishna", expanded=False):
+                st.write(reply)
+            with st.spinner("Speaking..."):
+                try:
+                    with tracing.span("app.tts"):
+                        audio_bytes = speak_bytes(reply, output_format)
+                    if audio_bytes:
+                        st.audio(audio_bytes, format=mime_type(output_format), autoplay=True)
+                    else:
+                        st.warning("⚠️ Audio file not generated.")
+                except Exception as tts_error:
+                    st.error(f"❌ Error during text-to-speech: {str(tts_error)}")
+        except Exception as llm_error:
+            st.error(f"❌ Error during AI response generation: {str(llm_error)}")
+            st.info("💡 Please check your API keys and try again.")
+
+def _frame_samples(frame):
+    samples = frame.to_ndarray().astype(np.float32) / 32768.0
+    if frame.format.is_planar:
+        return samples.T
+    return samples.reshape(-1, len(frame.layout.channels))
+
+def _listen_streaming(output_format):
+    context = webrtc_streamer(
+        key="krishna-stt",
+        mode=WebRtcMode.SENDONLY,
+        audio_receiver_size=256,
+        media_stream_constraints={"audio": True, "video": False}
+    )
+    partial_placeholder = st.empty()
+    if not context.audio_receiver:
+        return
+    transcriber = StreamingTranscriber()
+    try:
+        while context.state.playing:
+            try:
+                frames = context.audio_receiver.get_frames(timeout=1)
+            except queue.Empty:
+                continue
+            for frame in frames:
+                for event in transcriber.feed(_frame_samples(frame), frame.sample_rate):
+                    if event["type"] == "partial":
+                        partial_placeholder.caption(f"🎙️ {event['text']}")
+                        continue
+                    partial_placeholder.empty()
+                    if not event["text"]:
+                        continue
+                    with tracing.trace():
+                        tracing.observe("app.stt", event["latency"])
+                        _respond(event["text"], output_format)
+    finally:
+        transcriber.close()
 
 st.set_page_config(page_title="Krishna Voice Companion", layout="centered", initial_sidebar_state="collapsed")
+_start_tts_cache_warmup()
+_start_audio_server()
+_start_metrics_server()
+if WHISPER_WARMUP:
+    _start_whisper_warmup()
+if LOCAL_INTENT_ENABLED:
+    _start_intent_warmup()
 
 st.title("Krishna ")
 st.caption("Speak naturally in Hinglish - Krishna will respond in voice")
 
+if STREAM_STT and webrtc_streamer is not None:
+    _listen_streaming(_client_output_format())
+    st.stop()
+
 audio = audio_recorder(text="🎤 Speak", pause_threshold=2.0)
 
 if audio:
-    temp_dir = tempfile.gettempdir()
-    audio_path = None
-    tts_audio_path = None
+    output_format = _client_output_format()
+    active_trace, trace_token = tracing.start_trace()
     try:
-        with tempfile.NamedTemporaryFile(
-            delete=False, 
-            suffix=".wav",
-            dir=temp_dir,
-            mode='wb'
-        ) as f:
-            f.write(audio)
-            f.flush()
-            os.fsync(f.fileno())
-            audio_path = os.path.normpath(f.name)
-        if not os.path.exists(audio_path):
-            st.error("❌ Failed to save audio file. Please try again.")
-            st.stop()
-        if os.path.getsize(audio_path) == 0:
+        if len(audio) == 0:
             st.error("❌ Audio file is empty. Please record again.")
             st.stop()
         try:
             with st.spinner("Listening..."):
-                text = transcribe(audio_path)
-                if not text or not text.strip():
-                    st.warning("⚠️ No speech detected. Please try again.")
-                    st.stop()
-                with st.expander("💬 What you said", expanded=False):
-                    st.write(text)
-                with st.spinner("Krishna is thinking..."):
-                    try:
-                        reply = krishna_reply(text)
-                        if not reply or not reply.strip():
-                            st.warning("⚠️ No response generated. Please try again.")
-                            st.stop()
-                        with st.expander(" Krishna", expanded=False):
-                            st.write(reply)
-                        with st.spinner("Speaking..."):
-                            try:
-                                tts_audio_path = speak(reply)
-                                if tts_audio_path and os.path.exists(tts_audio_path):
-                                    with open(tts_audio_path, 'rb') as audio_file:
-                                        audio_bytes = audio_file.read()
-                                    audio_base64 = base64.b64encode(audio_bytes).decode()
-                                    audio_id = f"krishna_{int(time.time() * 1000000)}"
-                                    audio_html = f"""
-                                    <audio id="{audio_id}" autoplay style="display: none;">
-                                        <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
-                                    </audio>
-                                    <script>
-                                    (function() {{
-                                        var audio = document.getElementById('{audio_id}');
-                                        if (audio) {{
-                                            audio.play().catch(function(e) {{
-                                                console.log('Autoplay:', e);
-                                            }});
-                                        }}
-                                    }})();
-                                    </script>
-                                    """
-                                    st.markdown(audio_html, unsafe_allow_html=True)
-                                else:
-                                    st.warning("⚠️ Audio file not generated.")
-                            except Exception as tts_error:
-                                st.error(f"❌ Error during text-to-speech: {str(tts_error)}")
-                    except Exception as llm_error:
-                        st.error(f"❌ Error during AI response generation: {str(llm_error)}")
-                        st.info("💡 Please check your API keys and try again.")
+                with tracing.span("app.stt"):
+                    text = transcribe(audio)
+            if not text or not text.strip():
+                st.warning("⚠️ No speech detected. Please try again.")
+                st.stop()
+            _respond(text, output_format)
         except FileNotFoundError as fnf_error:
             st.error(f"❌ File not found error: {str(fnf_error)}")
             st.info("💡 Please ensure your audio is clear and try again.")
         except Exception as e:
             st.error(f"❌ Error during transcription: {str(e)}")
             st.info("💡 Please ensure your audio is clear and try again.")
-        finally:
-            try:
-                if audio_path and os.path.exists(audio_path):
-                    os.remove(audio_path)
-            except Exception:
-                pass
     except Exception as e:
         st.error(f"❌ Failed to process audio: {str(e)}")
-        try:
-            if audio_path and os.path.exists(audio_path):
-                os.remove(audio_path)
-            if tts_audio_path and os.path.exists(tts_audio_path):
-                os.remove(tts_audio_path)
-        except:
-            pass
+    finally:
+        tracing.end_trace(active_trace, trace_token)
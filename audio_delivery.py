@@ -0,0 +1,203 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+AUDIO_PORT = int(os.getenv("KRISHNA_AUDIO_PORT", "0"))
+AUDIO_HOST = os.getenv("KRISHNA_AUDIO_HOST", "127.0.0.1")
+AUDIO_BASE_URL = os.getenv("KRISHNA_AUDIO_BASE_URL", "").rstrip("/")
+STORE_MAX_BYTES = int(os.getenv("KRISHNA_AUDIO_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+STORE_TTL = float(os.getenv("KRISHNA_AUDIO_STORE_TTL", "600"))
+STREAM_IDLE_TIMEOUT = float(os.getenv("KRISHNA_AUDIO_STREAM_TIMEOUT", "60"))
+LOOPBACK_HOSTS = ("localhost", "127.0.0.1", "[::1]")
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+class AudioStore:
+    def __init__(self, max_bytes=STORE_MAX_BYTES, ttl=STORE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _drop(self, audio_id):
+        data, _, _ = self._entries.pop(audio_id)
+        self.total_bytes -= len(data)
+
+    def _expire(self, now):
+        while self._entries:
+            audio_id, (data, _, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now and self.total_bytes <= self.max_bytes:
+                break
+            self._drop(audio_id)
+
+    def put(self, data, mime, audio_id=None):
+        audio_id = audio_id or hashlib.sha256(data).hexdigest()[:32]
+        now = time.time()
+        with self._lock:
+            if audio_id in self._entries:
+                self._drop(audio_id)
+            self._entries[audio_id] = (data, mime, now + self.ttl)
+            self.total_bytes += len(data)
+            self._expire(now)
+        return audio_id
+
+    def get(self, audio_id):
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(audio_id)
+            if entry is None:
+                return None
+            return entry[0], entry[1]
+
+store = AudioStore()
+
+class AudioStream:
+    def __init__(self, mime):
+        self.mime = mime
+        self.audio_id = uuid.uuid4().hex
+        self.closed = False
+        self._chunks = []
+        self._condition = threading.Condition()
+
+    def write(self, data):
+        with self._condition:
+            self._chunks.append(data)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._condition.notify_all()
+            data = b"".join(self._chunks)
+        if data:
+            store.put(data, self.mime, self.audio_id)
+        with _streams_lock:
+            _streams.pop(self.audio_id, None)
+
+    def chunks(self, timeout=STREAM_IDLE_TIMEOUT):
+        index = 0
+        while True:
+            with self._condition:
+                if not self._condition.wait_for(lambda: index < len(self._chunks) or self.closed, timeout):
+                    return
+                if index >= len(self._chunks):
+                    return
+                chunk = self._chunks[index]
+            index += 1
+            yield chunk
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+class _AudioHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _stream(self, audio_stream, include_body):
+        self.send_response(200)
+        self.send_header("Content-Type", audio_stream.mime)
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        if not include_body:
+            return
+        try:
+            for chunk in audio_stream.chunks():
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _serve(self, include_body):
+        match = re.match(r"^/audio/([0-9a-f]+)$", self.path.split("?")[0])
+        if match:
+            with _streams_lock:
+                audio_stream = _streams.get(match.group(1))
+            if audio_stream is not None:
+                self._stream(audio_stream, include_body)
+                return
+        entry = store.get(match.group(1)) if match else None
+        if entry is None:
+            self.send_error(404)
+            return
+        data, mime = entry
+        start, end = 0, len(data) - 1
+        status = 200
+        requested = RANGE_RE.match(self.headers.get("Range", "").strip())
+        if requested and (requested.group(1) or requested.group(2)):
+            if requested.group(1):
+                start = int(requested.group(1))
+                if requested.group(2):
+                    end = min(end, int(requested.group(2)))
+            else:
+                start = max(0, len(data) - int(requested.group(2)))
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.end_headers()
+                return
+            status = 206
+        body = data[start:end + 1]
+        self.send_response(status)
+        self.send_header("Content-Type", mime)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", f"public, max-age={int(store.ttl)}, immutable")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._serve(True)
+
+    def do_HEAD(self):
+        self._serve(False)
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_server(port=AUDIO_PORT, host=AUDIO_HOST):
+    global _server
+    with _server_lock:
+        if _server is None and port:
+            _server = ThreadingHTTPServer((host, port), _AudioHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="audio-http", daemon=True).start()
+    return _server
+
+def enabled():
+    return _server is not None
+
+def base_url(headers=None):
+    if _server is None:
+        return None
+    if AUDIO_BASE_URL:
+        return AUDIO_BASE_URL
+    headers = headers or {}
+    host = headers.get("Host")
+    if not host or headers.get("X-Forwarded-For") or headers.get("X-Forwarded-Proto", "http") != "http":
+        return None
+    hostname = host.split("]")[0] + "]" if host.startswith("[") else host.split(":")[0]
+    if _server.server_address[0].startswith("127.") and hostname not in LOOPBACK_HOSTS:
+        return None
+    return f"http://{hostname}:{_server.server_address[1]}"
+
+def publish(data, mime, base):
+    return f"{base}/audio/{store.put(data, mime)}"
+
+def open_stream(mime, base):
+    audio_stream = AudioStream(mime)
+    with _streams_lock:
+        _streams[audio_stream.audio_id] = audio_stream
+    audio_stream.url = f"{base}/audio/{audio_stream.audio_id}"
+    return audio_stream
@@ -0,0 +1,201 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm")
+DEFAULT_STT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+DEFAULT_API_WORKERS = 4
+
+def discover(source, extensions=AUDIO_EXTENSIONS):
+    if os.path.isdir(source):
+        items = []
+        for directory, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(extensions):
+                    path = os.path.join(directory, name)
+                    items.append({"id": os.path.relpath(path, source), "path": path})
+        return sorted(items, key=lambda item: item["id"])
+    base = os.path.dirname(os.path.abspath(source))
+    items = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                path = record.get("path") or record.get("audio")
+                item_id = record.get("id") or path
+            else:
+                path = item_id = line
+            items.append({"id": str(item_id), "path": os.path.join(base, path)})
+    return items
+
+def load_completed(output_path):
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in record:
+                completed.add(record.get("id"))
+    return completed
+
+def _init_stt_worker(threads):
+    os.environ["KRISHNA_STT_WORKERS"] = "1"
+    os.environ["KRISHNA_STT_BATCHING"] = "0"
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    import stt
+    stt.get_model()
+
+def transcribe_item(path):
+    import stt
+    started = time.perf_counter()
+    result = stt.transcribe_detailed(path)
+    return {
+        "text": result["text"],
+        "duration": result["duration"],
+        "speech_duration": result["speech_duration"],
+        "stt_seconds": time.perf_counter() - started
+    }
+
+def _audio_name(item_id):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.splitext(item_id)[0]).strip("_") or "utterance"
+
+class ResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.written = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.written += 1
+            self.failed += "error" in record
+
+    def close(self):
+        self._file.close()
+
+def reply_item(item, transcript, args, writer):
+    import llm
+    import tracing
+    record = {"id": item["id"], "path": item["path"], "text": transcript["text"]}
+    timings = {"stt": transcript["stt_seconds"]}
+    started = time.perf_counter()
+    with tracing.trace("batch") as active:
+        record["trace_id"] = active.trace_id
+        try:
+            details = {}
+            stage_started = time.perf_counter()
+            record["reply"] = llm.krishna_reply(transcript["text"], args.mode, details) if transcript["text"] else ""
+            timings["llm"] = time.perf_counter() - stage_started
+            record["intent"] = details.get("intent")
+            record["normalized_text"] = details.get("normalized_text")
+            if details.get("error") or record["reply"] == llm.QUOTA_REPLY:
+                record["error"] = details.get("error") or "quota exhausted"
+            elif args.tts and record["reply"]:
+                import tts
+                stage_started = time.perf_counter()
+                output_format = args.output_format or tts.OUTPUT_FORMAT
+                output = os.path.join(args.audio_dir, _audio_name(item["id"]) + tts.file_extension(output_format))
+                if os.path.exists(output):
+                    os.remove(output)
+                record["audio_path"] = tts.speak(record["reply"], output=output, output_format=output_format)
+                timings["tts"] = time.perf_counter() - stage_started
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+    timings["total"] = timings["stt"] + time.perf_counter() - started
+    record["duration"] = transcript["duration"]
+    record["timings"] = timings
+    writer.write(record)
+
+def run(args):
+    items = discover(args.input)
+    completed = set() if args.no_resume else load_completed(args.output)
+    pending = [item for item in items if item["id"] not in completed]
+    print(f"{len(items)} files, {len(items) - len(pending)} already done, {len(pending)} to process", file=sys.stderr)
+    if not pending:
+        return 0
+    if args.tts:
+        os.makedirs(args.audio_dir, exist_ok=True)
+    import llm
+    if llm.LOCAL_INTENT_ENABLED:
+        import intent_classifier
+        intent_classifier.get_classifier()
+    writer = ResultWriter(args.output)
+    threads = max(1, (os.cpu_count() or 1) // args.stt_workers)
+    stt_pool = ProcessPoolExecutor(
+        max_workers=args.stt_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_stt_worker,
+        initargs=(threads,)
+    )
+    api_pool = ThreadPoolExecutor(max_workers=args.api_workers)
+    started = time.perf_counter()
+    try:
+        stt_futures = {stt_pool.submit(transcribe_item, item["path"]): item for item in pending}
+        api_futures = []
+        for future in as_completed(stt_futures):
+            item = stt_futures[future]
+            try:
+                transcript = future.result()
+            except Exception as e:
+                writer.write({"id": item["id"], "path": item["path"], "error": f"{type(e).__name__}: {e}"})
+                continue
+            api_futures.append(api_pool.submit(reply_item, item, transcript, args, writer))
+        for future in api_futures:
+            future.result()
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        stt_pool.shutdown(wait=False, cancel_futures=True)
+        api_pool.shutdown(wait=True, cancel_futures=True)
+        return 130
+    finally:
+        stt_pool.shutdown(wait=True)
+        api_pool.shutdown(wait=True)
+        writer.close()
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "processed": writer.written,
+        "failed": writer.failed,
+        "wall_seconds": elapsed,
+        "intent_sources": llm.intent_source_counts()
+    }, indent=2), file=sys.stderr)
+    return 1 if writer.failed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Run recorded audio through STT, the Krishna reply and optionally TTS, writing JSONL results.")
+    parser.add_argument("input", help="directory of audio files, or a manifest with one path or JSON object ({'id', 'path'}) per line")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--stt-workers", type=int, default=DEFAULT_STT_WORKERS, help="Whisper worker processes")
+    parser.add_argument("--api-workers", type=int, default=DEFAULT_API_WORKERS, help="threads issuing Gemini and ElevenLabs calls")
+    parser.add_argument("--mode", choices=["serial", "fused"], help="reasoning mode (default: KRISHNA_REASONING_MODE)")
+    parser.add_argument("--tts", action="store_true", help="synthesize each reply with ElevenLabs")
+    parser.add_argument("--audio-dir", help="where synthesized replies are written (default: <output>_audio)")
+    parser.add_argument("--output-format", help="ElevenLabs output format (default: KRISHNA_TTS_OUTPUT_FORMAT)")
+    parser.add_argument("--no-resume", action="store_true", help="reprocess files already present in the output")
+    args = parser.parse_args()
+    args.audio_dir = args.audio_dir or os.path.splitext(args.output)[0] + "_audio"
+    sys.exit(run(args))
+
+if __name__ == "__main__":
+    main()
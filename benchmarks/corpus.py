@@ -0,0 +1,63 @@
+import json
+import os
+import wave
+import numpy as np
+
+SAMPLE_RATE = 16000
+DEFAULT_DURATIONS = [2.0, 3.5, 5.0, 8.0, 12.0, 20.0]
+
+def _syllable(rng, seconds):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    pitch = rng.uniform(110, 240)
+    signal = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in range(1, 6))
+    envelope = np.sin(np.pi * t / seconds) ** 2
+    return (signal * envelope).astype(np.float32)
+
+def synthesize_clip(rng, speech_seconds, lead_silence=0.5, trail_silence=2.0):
+    pieces = [np.zeros(int(SAMPLE_RATE * lead_silence), dtype=np.float32)]
+    produced = 0.0
+    while produced < speech_seconds:
+        seconds = rng.uniform(0.12, 0.3)
+        pieces.append(_syllable(rng, seconds))
+        gap = rng.uniform(0.02, 0.08) if rng.random() > 0.15 else rng.uniform(0.25, 0.5)
+        pieces.append(np.zeros(int(SAMPLE_RATE * gap), dtype=np.float32))
+        produced += seconds + gap
+    pieces.append(np.zeros(int(SAMPLE_RATE * trail_silence), dtype=np.float32))
+    audio = np.concatenate(pieces)
+    audio += rng.normal(0, 0.002, len(audio)).astype(np.float32)
+    return 0.3 * audio / np.max(np.abs(audio))
+
+def write_wav(path, audio):
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+
+def generate_corpus(directory, durations=DEFAULT_DURATIONS, seed=7):
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for index, seconds in enumerate(durations):
+        path = os.path.join(directory, f"synthetic_{index:02d}_{seconds:g}s.wav")
+        if not os.path.exists(path):
+            write_wav(path, synthesize_clip(rng, seconds))
+        paths.append(path)
+    return paths
+
+def load_corpus(path):
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith((".wav", ".flac", ".ogg", ".mp3", ".webm"))
+        )
+    base = os.path.dirname(os.path.abspath(path))
+    paths = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)["path"]
+                paths.append(entry if os.path.isabs(entry) else os.path.join(base, entry))
+    return paths
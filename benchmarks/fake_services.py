@@ -0,0 +1,175 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INTENT_LABELS = ["Career/Purpose", "Relationships", "Inner Conflict", "Life Transitions", "Daily Struggles"]
+HINGLISH_REPLY = "Beta, yeh {intent} ka vichaar hai. Apne man ki awaaz suno. Karma karo, phal ki chinta mat karo."
+AUDIO_BYTES_PER_CHAR = 400
+STREAM_CHUNK_SIZE = 4096
+
+class FaultProfile:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, retry_after=1, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+
+    def next(self):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+            throttle = self._random.random() < self.error_rate
+            if throttle:
+                self.throttled += 1
+        return delay, throttle
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "throttled": self.throttled}
+
+def _gemini_text(prompt):
+    intent = INTENT_LABELS[sum(map(ord, prompt)) % len(INTENT_LABELS)]
+    if "intent classifier" in prompt:
+        return f"Intent: {intent}"
+    if "Convert the Hinglish" in prompt:
+        match = re.search(r"Hinglish: (.*)", prompt)
+        return match.group(1) if match else prompt
+    if "return them as JSON" in prompt:
+        match = re.search(r"User: (.*)", prompt)
+        return json.dumps({
+            "normalized_text": match.group(1) if match else "",
+            "intent": intent,
+            "reply": HINGLISH_REPLY.format(intent=intent)
+        })
+    match = re.search(r"classified as: (.*)", prompt)
+    return HINGLISH_REPLY.format(intent=match.group(1).strip() if match else intent)
+
+def _gemini_payload(text, prompt_tokens):
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0
+        }],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": len(text.split()),
+            "totalTokenCount": prompt_tokens + len(text.split())
+        }
+    }
+
+def _prompt_text(body):
+    parts = []
+    instruction = body.get("systemInstruction") or body.get("system_instruction") or {}
+    for part in instruction.get("parts", []):
+        parts.append(part.get("text", ""))
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    profile = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _throttle(self):
+        delay, throttle = self.profile.next()
+        time.sleep(delay)
+        if throttle:
+            body = json.dumps({"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}}).encode()
+            self._send(429, body, headers={"Retry-After": str(self.profile.retry_after)})
+            return True
+        return False
+
+    def _send_chunked(self, chunks, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+class GeminiHandler(_Handler):
+    def do_POST(self):
+        body = self._read_json()
+        if "/cachedContents" in self.path:
+            self._send(404, json.dumps({"error": {"code": 404, "message": "Context caching is not available.", "status": "NOT_FOUND"}}).encode())
+            return
+        if self._throttle():
+            return
+        prompt = _prompt_text(body)
+        text = _gemini_text(prompt)
+        prompt_tokens = len(prompt.split())
+        if ":streamGenerateContent" in self.path:
+            words = text.split(" ")
+            pieces = [" ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "") for i in range(0, len(words), 4)]
+            events = [
+                f"data: {json.dumps(_gemini_payload(piece, prompt_tokens))}\r\n\r\n".encode()
+                for piece in pieces
+            ]
+            self._send_chunked(events, "text/event-stream")
+            return
+        self._send(200, json.dumps(_gemini_payload(text, prompt_tokens)).encode())
+
+class ElevenLabsHandler(_Handler):
+    def do_POST(self):
+        body = self._read_json()
+        if self._throttle():
+            return
+        size = max(1, len(body.get("text", ""))) * AUDIO_BYTES_PER_CHAR
+        audio = b"ID3" + bytes(size - 3 if size > 3 else 0)
+        if self.path.split("?")[0].rstrip("/").endswith("/stream"):
+            self._send_chunked([audio[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(audio), STREAM_CHUNK_SIZE)], "audio/mpeg")
+            return
+        self._send(200, audio, content_type="audio/mpeg")
+
+class FakeService:
+    def __init__(self, handler, profile, host="127.0.0.1", port=0):
+        handler_class = type(handler.__name__, (handler,), {"profile": profile})
+        self.profile = profile
+        self.server = ThreadingHTTPServer((host, port), handler_class)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def start_gemini(profile):
+    return FakeService(GeminiHandler, profile).start()
+
+def start_elevenlabs(profile):
+    return FakeService(ElevenLabsHandler, profile).start()
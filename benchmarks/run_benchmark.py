@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+import fake_services
+
+STAGES = ["stt", "llm", "tts", "first_audio", "end_to_end"]
+STREAM_TTS_WORKERS = 2
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": _percentile(ordered, 0.5),
+        "p95": _percentile(ordered, 0.95),
+        "p99": _percentile(ordered, 0.99),
+        "max": ordered[-1]
+    }
+
+def _resource_usage():
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "peak_rss_bytes": usage.ru_maxrss * scale
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def configure_environment(gemini_url, elevenlabs_url, workdir, args):
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("ELEVEN_API_KEY", "benchmark")
+    os.environ["KRISHNA_GEMINI_ENDPOINT"] = gemini_url
+    os.environ["ELEVENLABS_BASE_URL"] = elevenlabs_url
+    os.environ["KRISHNA_TRACE_LOG"] = os.path.join(workdir, "traces.jsonl")
+    os.environ["KRISHNA_TTS_CACHE_DIR"] = os.path.join(workdir, "tts_cache")
+    if not args.tts_cache:
+        os.environ["KRISHNA_TTS_CACHE_MAX_BYTES"] = "0"
+    os.environ["KRISHNA_REASONING_MODE"] = args.mode
+    os.environ.setdefault("KRISHNA_GEMINI_RPM", "0")
+    os.environ.setdefault("KRISHNA_ELEVENLABS_RPM", "0")
+    if not args.memo:
+        os.environ["KRISHNA_MEMO"] = "0"
+    if args.whisper_model:
+        os.environ["KRISHNA_WHISPER_MODEL"] = args.whisper_model
+
+def _reply_blocking(text, record, started):
+    from llm import krishna_reply
+    from tts import speak
+    stage_started = time.perf_counter()
+    reply = krishna_reply(text)
+    record["llm"] = time.perf_counter() - stage_started
+    stage_started = time.perf_counter()
+    audio_path = speak(reply)
+    record["tts"] = time.perf_counter() - stage_started
+    record["first_audio"] = time.perf_counter() - started
+    os.remove(audio_path)
+    return reply
+
+def _reply_streaming(text, record, started):
+    from llm import krishna_reply_stream
+    from tts import speak_stream
+    first_chunks = {}
+
+    def synthesize(index, sentence):
+        for _ in speak_stream(sentence):
+            first_chunks.setdefault(index, time.perf_counter())
+
+    stage_started = time.perf_counter()
+    sentences = []
+    with ThreadPoolExecutor(max_workers=STREAM_TTS_WORKERS) as executor:
+        futures = []
+        for sentence in krishna_reply_stream(text):
+            futures.append(executor.submit(synthesize, len(sentences), sentence))
+            sentences.append(sentence)
+        record["llm"] = time.perf_counter() - stage_started
+        tts_tail_started = time.perf_counter()
+        for future in futures:
+            future.result()
+    record["tts"] = time.perf_counter() - tts_tail_started
+    if 0 in first_chunks:
+        record["first_audio"] = first_chunks[0] - started
+    return " ".join(sentences)
+
+def run_session(clips, iterations, results, lock, pipeline):
+    from stt import transcribe
+    reply_fn = _reply_streaming if pipeline == "stream" else _reply_blocking
+    for _ in range(iterations):
+        for clip in clips:
+            with open(clip, "rb") as f:
+                audio_bytes = f.read()
+            record = {"clip": os.path.basename(clip)}
+            started = time.perf_counter()
+            try:
+                stage_started = time.perf_counter()
+                text = transcribe(audio_bytes)
+                record["stt"] = time.perf_counter() - stage_started
+                record["reply"] = reply_fn(text or "mujhe career ki tension hai", record, started)
+                record["end_to_end"] = time.perf_counter() - started
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+            with lock:
+                results.append(record)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of transcribe -> Krishna reply -> TTS.")
+    parser.add_argument("--corpus", help="directory of audio clips or JSONL manifest with a 'path' field (default: generated synthetic clips)")
+    parser.add_argument("--sessions", type=int, default=1, help="concurrent simulated sessions")
+    parser.add_argument("--iterations", type=int, default=1, help="passes over the corpus per session")
+    parser.add_argument("--gemini-latency-ms", type=float, default=400.0)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--gemini-429-rate", type=float, default=0.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tts-jitter-ms", type=float, default=80.0)
+    parser.add_argument("--tts-429-rate", type=float, default=0.0)
+    parser.add_argument("--mode", default="serial", choices=["serial", "fused"])
+    parser.add_argument("--pipeline", default="stream", choices=["stream", "blocking"], help="stream: krishna_reply_stream with speak_stream per sentence, as the app does by default (tts is then the synthesis tail after the reply text completes); blocking: krishna_reply then speak")
+    parser.add_argument("--memo", action="store_true", help="keep the reply memoization layer enabled")
+    parser.add_argument("--tts-cache", action="store_true", help="keep the on-disk TTS cache enabled")
+    parser.add_argument("--whisper-model", help="Whisper model size (default: KRISHNA_WHISPER_MODEL or tiny)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="krishna_bench_")
+    clips = corpus.load_corpus(args.corpus) if args.corpus else corpus.generate_corpus(os.path.join(workdir, "corpus"))
+    gemini = fake_services.start_gemini(fake_services.FaultProfile(
+        args.gemini_latency_ms, args.gemini_jitter_ms, args.gemini_429_rate, seed=args.seed
+    ))
+    elevenlabs = fake_services.start_elevenlabs(fake_services.FaultProfile(
+        args.tts_latency_ms, args.tts_jitter_ms, args.tts_429_rate, seed=args.seed + 1
+    ))
+    configure_environment(gemini.url, elevenlabs.url, workdir, args)
+
+    import clients
+    import stt
+    import tracing
+    import tts
+    stt.warm_up()
+    usage_before = _resource_usage()
+    results = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = [executor.submit(run_session, clips, args.iterations, results, lock, args.pipeline) for _ in range(args.sessions)]
+        for future in futures:
+            future.result()
+    wall_seconds = time.perf_counter() - started
+    usage_after = _resource_usage()
+    gemini.stop()
+    elevenlabs.stop()
+
+    completed = [record for record in results if "error" not in record]
+    report = {
+        "commit": _git_commit(),
+        "config": vars(args),
+        "clips": len(clips),
+        "utterances": len(results),
+        "errors": len(results) - len(completed),
+        "error_samples": sorted({record["error"] for record in results if "error" in record})[:5],
+        "wall_seconds": wall_seconds,
+        "throughput_per_second": len(completed) / wall_seconds if wall_seconds else 0.0,
+        "stages": {stage: summarize([record[stage] for record in completed if stage in record]) for stage in STAGES},
+        "pipeline_stages": tracing.snapshot()["histograms"],
+        "upstream": {"gemini": gemini.profile.stats(), "elevenlabs": elevenlabs.profile.stats()},
+        "schedulers": clients.scheduler_stats(),
+        "tts_cache": tts.cache_stats(),
+        "whisper": stt.model_stats()
+    }
+    if usage_before and usage_after:
+        report["cpu_seconds"] = usage_after["cpu_seconds"] - usage_before["cpu_seconds"]
+        report["peak_rss_bytes"] = usage_after["peak_rss_bytes"]
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+PRIORITY_RESPONSE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_OPTIONAL = 2
+PRIORITY_BACKGROUND = 3
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRY_BUDGET = float(os.getenv("KRISHNA_RETRY_BUDGET", "8"))
+RETRY_DELAY_RES = (
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry(?:[ -]after)?\s+in\s+(\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+    re.compile(r"retry[ -]after:?\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+)
+
+class RateLimitTimeout(Exception):
+    pass
+
+def _status_code(error):
+    for candidate in (getattr(error, "response", None), error):
+        code = getattr(candidate, "status_code", None)
+        if code is None:
+            code = getattr(candidate, "code", None)
+            code = code() if callable(code) else code
+            code = getattr(code, "value", code)
+            if isinstance(code, tuple):
+                code = code[0]
+        if isinstance(code, int):
+            return code
+    return None
+
+def is_retryable(error):
+    if isinstance(error, RateLimitTimeout):
+        return False
+    if _status_code(error) in RETRYABLE_STATUS:
+        return True
+    name = type(error).__name__
+    if name in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("Retry-After")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+    message = str(error)
+    for pattern in RETRY_DELAY_RES:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _available(self, now):
+        return now >= self.blocked_until and self.tokens >= 1
+
+    def _delay(self, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def acquire(self, priority=PRIORITY_NORMAL, timeout=None):
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] == entry and self._available(now):
+                        self.tokens -= 1
+                        return True
+                    wait = self._delay(now) or 0.05
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            return False
+                        wait = min(wait, remaining)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def try_acquire(self, priority=PRIORITY_NORMAL):
+        if self.rate <= 0:
+            return True
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            if self._available(now) and (not self._waiters or self._waiters[0][0] > priority):
+                self.tokens -= 1
+                return True
+            return False
+
+    def pause(self, seconds):
+        with self._condition:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+class CallScheduler:
+    def __init__(self, name, requests_per_minute, burst, max_attempts=4, base_delay=0.5, max_delay=20.0, retry_budget=RETRY_BUDGET):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._in_flight_async = {}
+        self._counters = {"calls": 0, "upstream_calls": 0, "retries": 0, "coalesced": 0, "rate_limit_timeouts": 0, "failures": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _backoff(self, attempt, error, waited):
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            self.bucket.pause(min(retry_after, self.retry_budget))
+            delay = retry_after + self._random.uniform(0, self.base_delay)
+        else:
+            delay = self._random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return delay if waited + delay <= self.retry_budget else None
+
+    def _attempts(self, priority):
+        return 1 if priority >= PRIORITY_OPTIONAL else self.max_attempts
+
+    def _run(self, fn, priority, wait_timeout):
+        attempts = self._attempts(priority)
+        waited = 0.0
+        for attempt in range(attempts):
+            if not self.bucket.acquire(priority, wait_timeout):
+                self._count("rate_limit_timeouts")
+                raise RateLimitTimeout(f"{self.name}: no request budget within {wait_timeout}s")
+            self._count("upstream_calls")
+            try:
+                return fn()
+            except Exception as e:
+                delay = self._backoff(attempt, e, waited) if attempt < attempts - 1 and is_retryable(e) else None
+                if delay is None:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                waited += delay
+                time.sleep(delay)
+
+    def call(self, fn, key=None, priority=PRIORITY_NORMAL, wait_timeout=None):
+        self._count("calls")
+        if key is None:
+            return self._run(fn, priority, wait_timeout)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._counters["coalesced"] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = self._run(fn, priority, wait_timeout)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def _acquire_async(self, priority, wait_timeout):
+        deadline = None if wait_timeout is None else time.monotonic() + wait_timeout
+        while not self.bucket.try_acquire(priority):
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return False
+            with self.bucket._condition:
+                delay = self.bucket._delay(now) or 0.05
+            await asyncio.sleep(min(delay, 0.25))
+        return True
+
+    async def _run_async(self, coroutine_fn, priority, wait_timeout):
+        attempts = self._attempts(priority)
+        waited = 0.0
+        for attempt in range(attempts):
+            if not await self._acquire_async(priority, wait_timeout):
+                self._count("rate_limit_timeouts")
+                raise RateLimitTimeout(f"{self.name}: no request budget within {wait_timeout}s")
+            self._count("upstream_calls")
+            try:
+                return await coroutine_fn()
+            except Exception as e:
+                delay = self._backoff(attempt, e, waited) if attempt < attempts - 1 and is_retryable(e) else None
+                if delay is None:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                waited += delay
+                await asyncio.sleep(delay)
+
+    async def call_async(self, coroutine_fn, key=None, priority=PRIORITY_NORMAL, wait_timeout=None):
+        self._count("calls")
+        if key is None:
+            return await self._run_async(coroutine_fn, priority, wait_timeout)
+        task = self._in_flight_async.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_async(coroutine_fn, priority, wait_timeout))
+            self._in_flight_async[key] = task
+            task.add_done_callback(lambda done: self._finish_async(key, done))
+        else:
+            self._count("coalesced")
+        return await asyncio.shield(task)
+
+    def _finish_async(self, key, task):
+        if self._in_flight_async.get(key) is task:
+            del self._in_flight_async[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["tokens"] = round(self.bucket.tokens, 2)
+        stats["waiting"] = len(self.bucket._waiters)
+        return stats
@@ -0,0 +1,207 @@
+import datetime
+import os
+import re
+import threading
+import time
+import requests
+import google.generativeai as genai
+from requests.adapters import HTTPAdapter
+import streamlit as st
+from call_scheduler import PRIORITY_BACKGROUND, CallScheduler
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("KRISHNA_HTTP_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.getenv("KRISHNA_HTTP_POOL_MAXSIZE", "32"))
+GEMINI_ENDPOINT = os.getenv("KRISHNA_GEMINI_ENDPOINT", "")
+GEMINI_RPM = float(os.getenv("KRISHNA_GEMINI_RPM", "60"))
+GEMINI_BURST = int(os.getenv("KRISHNA_GEMINI_BURST", "5"))
+ELEVENLABS_RPM = float(os.getenv("KRISHNA_ELEVENLABS_RPM", "120"))
+ELEVENLABS_BURST = int(os.getenv("KRISHNA_ELEVENLABS_BURST", "5"))
+CONTEXT_CACHE_ENABLED = os.getenv("KRISHNA_CONTEXT_CACHE", "0") != "0"
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("KRISHNA_CONTEXT_CACHE_MIN_TOKENS", "0"))
+CONTEXT_CACHE_MODEL_MIN_TOKENS = [
+    ("gemini-1.5", 32768),
+    ("gemini-2.0", 4096),
+    ("gemini-2.5-pro", 4096),
+    ("gemini-2.5-flash", 1024)
+]
+CONTEXT_CACHE_TTL = int(os.getenv("KRISHNA_CONTEXT_CACHE_TTL", "3600"))
+CONTEXT_CACHE_REFRESH_MARGIN = int(os.getenv("KRISHNA_CONTEXT_CACHE_REFRESH", "300"))
+CONTEXT_CACHE_RETRY = int(os.getenv("KRISHNA_CONTEXT_CACHE_RETRY", "600"))
+
+_lock = threading.Lock()
+_secrets = {}
+_http_session = None
+_gemini_configured = False
+_gemini_models = {}
+_cache_lock = threading.Lock()
+_context_caches = {}
+_context_cache_retry = {}
+_context_cache_ineligible = set()
+_context_cache_refreshing = set()
+_context_cache_counts = {"created": 0, "refreshed": 0, "failed": 0, "ineligible": 0}
+
+gemini_scheduler = CallScheduler("gemini", GEMINI_RPM, GEMINI_BURST)
+elevenlabs_scheduler = CallScheduler("elevenlabs", ELEVENLABS_RPM, ELEVENLABS_BURST)
+
+def get_secret(name):
+    value = _secrets.get(name)
+    if value is not None:
+        return value
+    with _lock:
+        if name not in _secrets:
+            try:
+                value = st.secrets[name]
+            except Exception:
+                value = os.getenv(name)
+            if value is None:
+                raise KeyError(f"Missing secret: {name}")
+            _secrets[name] = value
+        return _secrets[name]
+
+def get_http_session():
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    pool_block=False
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+def _configure_gemini():
+    global _gemini_configured
+    api_key = get_secret("GEMINI_API_KEY")
+    with _lock:
+        if not _gemini_configured:
+            if GEMINI_ENDPOINT:
+                genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": GEMINI_ENDPOINT})
+            else:
+                genai.configure(api_key=api_key)
+            _gemini_configured = True
+
+def get_gemini_model(model_name, system_instruction=None):
+    key = (model_name, system_instruction)
+    model = _gemini_models.get(key)
+    if model is not None:
+        return model
+    _configure_gemini()
+    with _lock:
+        if key not in _gemini_models:
+            _gemini_models[key] = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        return _gemini_models[key]
+
+def _cacheable_model_name(model_name):
+    name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+    if name.startswith("models/gemini-1.5") and not re.search(r"-\d{3}$", name):
+        return None
+    return name
+
+def context_cache_min_tokens(model_name):
+    if CONTEXT_CACHE_MIN_TOKENS:
+        return CONTEXT_CACHE_MIN_TOKENS
+    name = model_name.split("/")[-1]
+    for prefix, tokens in CONTEXT_CACHE_MODEL_MIN_TOKENS:
+        if name.startswith(prefix):
+            return tokens
+    return CONTEXT_CACHE_MODEL_MIN_TOKENS[0][1]
+
+def _create_context_cache(model_name, system_instruction):
+    from google.generativeai import caching
+    cached = caching.CachedContent.create(
+        model=model_name,
+        system_instruction=system_instruction,
+        ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL)
+    )
+    return {"cached": cached, "model": genai.GenerativeModel.from_cached_content(cached)}
+
+def _refresh_context_cache(model_name, system_instruction):
+    key = (model_name, system_instruction)
+    try:
+        now = time.monotonic()
+        entry = _context_caches.get(key)
+        if entry is not None and now < entry["expires_at"]:
+            cached = entry["cached"]
+            gemini_scheduler.call(
+                lambda: cached.update(ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL)),
+                priority=PRIORITY_BACKGROUND
+            )
+            counter = "refreshed"
+        else:
+            cache_model = _cacheable_model_name(model_name)
+            tokens = 0
+            if cache_model is not None:
+                tokens = gemini_scheduler.call(
+                    lambda: get_gemini_model(model_name).count_tokens(system_instruction),
+                    priority=PRIORITY_BACKGROUND
+                ).total_tokens
+            if tokens < context_cache_min_tokens(model_name):
+                with _cache_lock:
+                    _context_cache_ineligible.add(key)
+                    _context_cache_counts["ineligible"] += 1
+                return
+            entry = gemini_scheduler.call(
+                lambda: _create_context_cache(cache_model, system_instruction),
+                priority=PRIORITY_BACKGROUND
+            )
+            counter = "created"
+        entry["expires_at"] = now + CONTEXT_CACHE_TTL
+        entry["refresh_at"] = entry["expires_at"] - min(CONTEXT_CACHE_REFRESH_MARGIN, CONTEXT_CACHE_TTL / 2)
+        with _cache_lock:
+            _context_caches[key] = entry
+            _context_cache_counts[counter] += 1
+    except Exception:
+        with _cache_lock:
+            _context_cache_retry[key] = time.monotonic() + CONTEXT_CACHE_RETRY
+            _context_cache_counts["failed"] += 1
+    finally:
+        with _cache_lock:
+            _context_cache_refreshing.discard(key)
+
+def _schedule_context_cache(model_name, system_instruction):
+    key = (model_name, system_instruction)
+    with _cache_lock:
+        if key in _context_cache_ineligible or key in _context_cache_refreshing:
+            return
+        if _context_cache_retry.get(key, 0) > time.monotonic():
+            return
+        _context_cache_refreshing.add(key)
+    threading.Thread(
+        target=_refresh_context_cache,
+        args=(model_name, system_instruction),
+        name="krishna-context-cache",
+        daemon=True
+    ).start()
+
+def get_instructed_model(model_name, system_instruction):
+    fallback = get_gemini_model(model_name, system_instruction)
+    if not CONTEXT_CACHE_ENABLED:
+        return fallback
+    key = (model_name, system_instruction)
+    if key in _context_cache_ineligible:
+        return fallback
+    now = time.monotonic()
+    entry = _context_caches.get(key)
+    if entry is None or now >= entry["refresh_at"]:
+        _schedule_context_cache(model_name, system_instruction)
+    if entry is not None and now < entry["expires_at"]:
+        return entry["model"]
+    return fallback
+
+def context_cache_stats():
+    with _cache_lock:
+        stats = dict(_context_cache_counts)
+        stats["active"] = len(_context_caches)
+        stats["enabled"] = CONTEXT_CACHE_ENABLED
+    return stats
+
+def scheduler_stats():
+    return {
+        "gemini": gemini_scheduler.stats(),
+        "elevenlabs": elevenlabs_scheduler.stats()
+    }
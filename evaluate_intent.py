@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import random
+import time
+import intent_classifier
+
+def load_records(path):
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+def label_with_llm(records):
+    from llm import classify_intent_llm, NO_INTENT_LABEL
+    for record in records:
+        record["intent"] = classify_intent_llm(record["text"]) or NO_INTENT_LABEL
+    return records
+
+def evaluate(classifier, records, threshold):
+    handled = correct_handled = correct_all = 0
+    elapsed = 0.0
+    for record in records:
+        started = time.perf_counter()
+        label, confidence = classifier.predict(record["text"])
+        elapsed += time.perf_counter() - started
+        is_correct = label == record["intent"]
+        correct_all += is_correct
+        if confidence >= threshold:
+            handled += 1
+            correct_handled += is_correct
+    total = len(records)
+    return {
+        "total": total,
+        "threshold": threshold,
+        "handled": handled,
+        "handled_share": handled / total if total else 0.0,
+        "accuracy_handled": correct_handled / handled if handled else 0.0,
+        "accuracy_all": correct_all / total if total else 0.0,
+        "mean_predict_ms": elapsed * 1000 / total if total else 0.0
+    }
+
+def cross_validate(records, folds, threshold, seed=0):
+    records = list(records)
+    random.Random(seed).shuffle(records)
+    labels = sorted({record["intent"] for record in records})
+    results = []
+    for fold in range(folds):
+        test = records[fold::folds]
+        train = [(r["text"], r["intent"]) for i, r in enumerate(records) if i % folds != fold]
+        classifier = intent_classifier.train(train, labels)
+        results.append(evaluate(classifier, test, threshold))
+    total = sum(r["total"] for r in results)
+    handled = sum(r["handled"] for r in results)
+    return {
+        "folds": folds,
+        "total": total,
+        "threshold": threshold,
+        "handled": handled,
+        "handled_share": handled / total if total else 0.0,
+        "accuracy_handled": sum(r["accuracy_handled"] * r["handled"] for r in results) / handled if handled else 0.0,
+        "accuracy_all": sum(r["accuracy_all"] * r["total"] for r in results) / total if total else 0.0,
+        "mean_predict_ms": sum(r["mean_predict_ms"] * r["total"] for r in results) / total if total else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local intent classifier on held-out examples.")
+    parser.add_argument("data", nargs="?", default=intent_classifier.EXAMPLES_PATH, help="JSONL file with 'text' and optional 'intent' fields")
+    parser.add_argument("--threshold", type=float, default=intent_classifier.DEFAULT_THRESHOLD, help="confidence threshold for handling a request locally")
+    parser.add_argument("--label-with-llm", action="store_true", help="relabel every record with Gemini so the classifier is scored against LLM labels")
+    parser.add_argument("--cross-validate", type=int, default=5, metavar="K", help="number of cross-validation folds (default: 5)")
+    parser.add_argument("--bundled", action="store_true", help="score the bundled model instead; only meaningful on data it was not trained on")
+    args = parser.parse_args()
+    threshold = args.threshold
+    if args.bundled and os.path.abspath(args.data) == os.path.abspath(intent_classifier.EXAMPLES_PATH):
+        parser.error("the bundled model is trained on this file; use cross-validation or pass held-out data")
+    if not args.bundled and args.cross_validate < 2:
+        parser.error("--cross-validate needs at least 2 folds")
+    records = load_records(args.data)
+    if args.label_with_llm:
+        records = label_with_llm(records)
+    records = [record for record in records if record.get("intent")]
+    if args.bundled:
+        report = evaluate(intent_classifier.get_classifier(), records, threshold)
+    else:
+        report = cross_validate(records, args.cross_validate, threshold)
+    report["labels"] = "llm" if args.label_with_llm else "file"
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
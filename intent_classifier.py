@@ -0,0 +1,127 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+import zlib
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_examples.jsonl")
+NUM_BUCKETS = 2 ** 18
+CHAR_NGRAM_SIZES = (2, 3, 4)
+EPOCHS = 25
+LEARNING_RATE = 0.5
+L2_PENALTY = 1e-4
+SEED = 13
+DEFAULT_THRESHOLD = float(os.getenv("KRISHNA_LOCAL_INTENT_THRESHOLD", "0.8"))
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", (text or "").lower()).strip()
+
+def extract_features(text):
+    text = _normalize(text)
+    tokens = re.findall(r"[\w']+", text)
+    names = ["w:" + token for token in tokens]
+    names.extend(f"b:{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    padded = f" {text} "
+    for size in CHAR_NGRAM_SIZES:
+        names.extend("c:" + padded[i:i + size] for i in range(len(padded) - size + 1))
+    features = {}
+    for name in names:
+        bucket = zlib.crc32(name.encode("utf-8")) % NUM_BUCKETS
+        features[bucket] = features.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in features.values()))
+    if norm > 0:
+        for bucket in features:
+            features[bucket] /= norm
+    return features
+
+def _softmax(scores):
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+class IntentClassifier:
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self.weights = [{} for _ in self.labels]
+        self.bias = [0.0 for _ in self.labels]
+
+    def _scores(self, features):
+        scores = []
+        for weights, bias in zip(self.weights, self.bias):
+            score = bias
+            for bucket, value in features.items():
+                score += weights.get(bucket, 0.0) * value
+            scores.append(score)
+        return scores
+
+    def predict_proba(self, text):
+        return _softmax(self._scores(extract_features(text)))
+
+    def predict(self, text):
+        probabilities = self.predict_proba(text)
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.labels[best], probabilities[best]
+
+    def fit(self, examples, epochs=EPOCHS, learning_rate=LEARNING_RATE, l2_penalty=L2_PENALTY, seed=SEED):
+        index = {label: i for i, label in enumerate(self.labels)}
+        samples = [(extract_features(text), index[label]) for text, label in examples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1.0 + epoch * 0.1)
+            for features, target in samples:
+                probabilities = _softmax(self._scores(features))
+                for k, weights in enumerate(self.weights):
+                    gradient = probabilities[k] - (1.0 if k == target else 0.0)
+                    self.bias[k] -= rate * gradient
+                    for bucket, value in features.items():
+                        current = weights.get(bucket, 0.0)
+                        weights[bucket] = current - rate * (gradient * value + l2_penalty * current)
+        return self
+
+def load_examples(path=EXAMPLES_PATH):
+    examples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            examples.append((record["text"], record["intent"]))
+    return examples
+
+def train(examples=None, labels=None):
+    examples = examples if examples is not None else load_examples()
+    if labels is None:
+        labels = sorted({label for _, label in examples})
+    return IntentClassifier(labels).fit(examples)
+
+_classifier = None
+_classifier_lock = threading.Lock()
+_training = None
+_training_lock = threading.Lock()
+
+def warm_up():
+    global _training
+    with _training_lock:
+        if _classifier is None and _training is None:
+            _training = threading.Thread(target=get_classifier, name="intent-classifier-train", daemon=True)
+            _training.start()
+    return _training
+
+def get_classifier(block=True):
+    global _classifier
+    if _classifier is None:
+        if not block:
+            warm_up()
+            return None
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = train()
+    return _classifier
+
+def predict(text):
+    return get_classifier().predict(text)
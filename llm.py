@@ -1,46 +1,90 @@
-import google.generativeai as genai
 import os 
 import re
+import json
+import time
+import hashlib
+import threading
+from collections import deque
 from dotenv import load_dotenv
 load_dotenv()
-import streamlit as st
+import intent_classifier
+import memo
+import tracing
+from call_scheduler import PRIORITY_NORMAL, PRIORITY_OPTIONAL, PRIORITY_RESPONSE
+from clients import gemini_scheduler, get_gemini_model, get_instructed_model
 
-genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
+MODEL_NAME = os.getenv("KRISHNA_GEMINI_MODEL", "gemini-1.5-flash")
+REASONING_MODES = ["serial", "fused"]
+REASONING_MODE = os.getenv("KRISHNA_REASONING_MODE", "serial")
+if REASONING_MODE not in REASONING_MODES:
+    raise ValueError(f"KRISHNA_REASONING_MODE must be one of {REASONING_MODES}, got {REASONING_MODE!r}")
+LATENCY_WINDOW = 500
+LOCAL_INTENT_ENABLED = os.getenv("KRISHNA_LOCAL_INTENT", "0") != "0"
+LOCAL_INTENT_THRESHOLD = intent_classifier.DEFAULT_THRESHOLD
+OPTIONAL_CALL_WAIT = float(os.getenv("KRISHNA_OPTIONAL_CALL_WAIT", "1.5"))
 
-MODEL_NAME = "gemini-1.5-flash"
+def _get_model(system_instruction=None):
+    if system_instruction:
+        return get_instructed_model(MODEL_NAME, system_instruction)
+    return get_gemini_model(MODEL_NAME)
 
-def _create_fresh_model():
-    return genai.GenerativeModel(MODEL_NAME)
+def _flight_key(prompt, kwargs, system_instruction=None):
+    payload = json.dumps([MODEL_NAME, system_instruction, prompt, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _generate(prompt, system_instruction=None, priority=PRIORITY_RESPONSE, wait_timeout=None, **kwargs):
+    response = gemini_scheduler.call(
+        lambda: _get_model(system_instruction).generate_content(prompt, **kwargs),
+        key=_flight_key(prompt, kwargs, system_instruction),
+        priority=priority,
+        wait_timeout=wait_timeout
+    )
+    tracing.record_llm_call(response)
+    return response
+
+NORMALIZATION_INSTRUCTION = """Convert the Hinglish (Hindi+English mix) text in each message to clean English while preserving the exact meaning and intent.
+
+Output ONLY the normalized English text, nothing else."""
+
+NORMALIZATION_PROMPT = """Hinglish: {text}"""
+
+def needs_normalization(text):
+    hindi_chars = len(re.findall(r'[\u0900-\u097F]', text))
+    total_chars = len(re.findall(r'[a-zA-Z\u0900-\u097F\s]', text))
+    return not (total_chars > 0 and hindi_chars / total_chars < 0.2)
+
+def _clean_normalized(text):
+    normalized = re.sub(r'^(English:|Normalized:|\"|\')', '', text.strip(), flags=re.IGNORECASE).strip()
+    return normalized.strip('"\'')
 
 def normalize_hinglish_to_english(hinglish_text):
     if not hinglish_text or not hinglish_text.strip():
         return ""
     text = hinglish_text.strip()
-    hindi_chars = len(re.findall(r'[\u0900-\u097F]', text))
-    total_chars = len(re.findall(r'[a-zA-Z\u0900-\u097F\s]', text))
-    if total_chars > 0 and hindi_chars / total_chars < 0.2:
+    if not needs_normalization(text):
         return text
-    normalization_prompt = f"""Convert this Hinglish (Hindi+English mix) text to clean English while preserving the exact meaning and intent.
-
-Hinglish: {text}
-
-Output ONLY the normalized English text, nothing else:"""
+    cached = memo.get_normalized(text)
+    if cached:
+        return cached
     try:
-        model = _create_fresh_model()
-        response = model.generate_content(normalization_prompt)
+        with tracing.span("llm.normalize"):
+            response = _generate(
+                NORMALIZATION_PROMPT.format(text=text),
+                NORMALIZATION_INSTRUCTION,
+                priority=PRIORITY_OPTIONAL,
+                wait_timeout=OPTIONAL_CALL_WAIT
+            )
         if response and hasattr(response, 'text') and response.text:
-            normalized = response.text.strip()
-            normalized = re.sub(r'^(English:|Normalized:|\"|\')', '', normalized, flags=re.IGNORECASE).strip()
-            normalized = normalized.strip('"\'')
+            normalized = _clean_normalized(response.text)
+            memo.put_normalized(text, normalized)
             return normalized if normalized else text
     except Exception as e:
-        error_str = str(e).lower()
-        if "429" in error_str or "quota" in error_str or "rate limit" in error_str:
+        if _is_quota_error(e):
             raise
         return text
     return text
 
-INTENT_PROMPT = """
+INTENT_INSTRUCTION = """
 You are a spiritual intent classifier for Lord Krishna's guidance system.
 
 CRITICAL RULES:
@@ -65,12 +109,12 @@ CLASSIFICATION LOGIC:
 
 Format your response as:
 Intent: <category or "No-Intent / Casual Greeting">
-
-User: {text}
 """
 
-HINGLISH_RESPONSE_PROMPT = """
-You are Lord Krishna speaking to a devotee. The user has expressed a concern classified as: {intent}
+INTENT_PROMPT = """User: {text}"""
+
+HINGLISH_RESPONSE_INSTRUCTION = """
+You are Lord Krishna speaking to a devotee. Each message gives the category the devotee's concern was classified as, followed by the concern itself.
 
 CRITICAL: Respond ONLY in warm, natural Hinglish (Hindi + English mix). This is how modern Indians speak - mixing Hindi and English naturally.
 
@@ -85,55 +129,334 @@ EXAMPLES:
 - Career/Purpose: "Yeh Career/Purpose ka vichaar hai. Arjun, jo tumhara man sach mein chahta hai, wahi tumhara dharm hai. Karma karo, phal ki chinta mat karo."
 - Relationships: "Yeh Relationships ka mudda hai. Prem aur samman dono zaroori hain. Jab tum apne aap ko samjho, tabhi doosron ko bhi samajh sakte ho."
 - Inner Conflict: "Yeh Inner Conflict hai. Jab man mein confusion ho, toh dhyan se suno apne andar ki awaaz. Satya hamesha jeetega."
+"""
+
+HINGLISH_RESPONSE_PROMPT = """Concern classified as: {intent}
 
 User's concern: {normalized_text}
 
-Respond in warm Hinglish:
+Respond in warm Hinglish:"""
+
+NO_INTENT_LABEL = "No-Intent / Casual Greeting"
+INTENT_LABELS = ["Career/Purpose", "Relationships", "Inner Conflict", "Life Transitions", "Daily Struggles", NO_INTENT_LABEL]
+
+FUSED_INSTRUCTION = """
+You are Lord Krishna's guidance system. Do all three steps below for the user's message and return them as JSON.
+
+1. normalized_text: Convert the Hinglish (Hindi+English mix) message to clean English while preserving the exact meaning and intent. If it is already English, copy it unchanged.
+2. intent: Classify the normalized text into exactly one of: "Career/Purpose", "Relationships", "Inner Conflict", "Life Transitions", "Daily Struggles", "No-Intent / Casual Greeting".
+   - Use "No-Intent / Casual Greeting" ONLY when the message is just a greeting, small talk or filler with no personal problem or spiritual concern.
+   - Otherwise pick the spiritual category that best matches the user's genuine problem, struggle, question or concern.
+3. reply: As Lord Krishna speaking to a devotee, respond ONLY in warm, natural Hinglish (Hindi + English mix), spiritually wise but conversational, addressing their specific concern with empathy. Keep it concise (2-3 sentences max for voice). Leave it empty when the intent is "No-Intent / Casual Greeting".
+
+Example reply for Career/Purpose: "Yeh Career/Purpose ka vichaar hai. Arjun, jo tumhara man sach mein chahta hai, wahi tumhara dharm hai. Karma karo, phal ki chinta mat karo."
 """
 
-def krishna_reply(hinglish_text):
+FUSED_PROMPT = """User: {text}"""
+
+FUSED_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "normalized_text": {"type": "string"},
+        "intent": {"type": "string", "enum": INTENT_LABELS},
+        "reply": {"type": "string"}
+    },
+    "required": ["normalized_text", "intent", "reply"]
+}
+
+FUSED_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": FUSED_RESPONSE_SCHEMA
+}
+
+WELCOME_REPLY = "Welcome, dear one. Speak what troubles your heart."
+QUOTA_REPLY = "Krishna is momentarily unavailable due to API quota limits. Please try again shortly."
+CANNED_REPLIES = [WELCOME_REPLY, QUOTA_REPLY]
+
+SIMPLE_GREETINGS = ["hi", "hello", "hey", "hi there", "hello there", "hey there", "namaste", "namaskar"]
+CASUAL_PHRASES = ["how are you", "how are you?", "what's up", "what's up?", "good morning", "good afternoon", "good evening", "kaise ho", "kaise hain"]
+
+SENTENCE_END_RE = re.compile(r'(.+?[.!?\u0964]+["\')]*)\s+', re.DOTALL)
+
+def _is_quota_error(error):
+    error_str = str(error).lower()
+    return "429" in error_str or "quota" in error_str or "rate limit" in error_str
+
+def _clean_response(text):
+    text = re.sub(r'^(Response:|Hinglish Response:|\"|\')', '', text.strip(), flags=re.IGNORECASE).strip()
+    return text.strip('"\'')
+
+_latencies = {}
+_latency_lock = threading.Lock()
+fused_fallbacks = 0
+
+def _record_latency(mode, seconds):
+    with _latency_lock:
+        _latencies.setdefault(mode, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def latency_summary():
+    with _latency_lock:
+        snapshot = {mode: sorted(values) for mode, values in _latencies.items()}
+        fallbacks = fused_fallbacks
+    summary = {}
+    for mode, values in snapshot.items():
+        if not values:
+            continue
+        summary[mode] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": _percentile(values, 0.5),
+            "p95": _percentile(values, 0.95)
+        }
+    summary["fused_fallbacks"] = fallbacks
+    return summary
+
+def _reasoning_mode(mode):
+    mode = mode or REASONING_MODE
+    if mode not in REASONING_MODES:
+        raise ValueError(f"Unknown reasoning mode {mode!r}; expected one of {REASONING_MODES}")
+    return mode
+
+def _is_no_intent(intent):
+    return not intent or "no-intent" in intent.lower() or "casual greeting" in intent.lower()
+
+def _greeting_reply(hinglish_text):
     if not hinglish_text or not hinglish_text.strip():
-        return "Welcome, dear one. Speak what troubles your heart."
+        return WELCOME_REPLY
     text_lower = hinglish_text.strip().lower()
-    simple_greetings = ["hi", "hello", "hey", "hi there", "hello there", "hey there", "namaste", "namaskar"]
-    if text_lower in simple_greetings or text_lower in ["how are you", "how are you?", "what's up", "what's up?", "good morning", "good afternoon", "good evening", "kaise ho", "kaise hain"]:
-        return "Welcome, dear one. Speak what troubles your heart."
-    normalized_text = normalize_hinglish_to_english(hinglish_text)
-    intent_prompt = INTENT_PROMPT.format(text=normalized_text)
+    if text_lower in SIMPLE_GREETINGS or text_lower in CASUAL_PHRASES:
+        return WELCOME_REPLY
+    return None
+
+def _fused_reply(hinglish_text, details=None):
+    with tracing.span("llm.fused"):
+        response = _generate(
+            FUSED_PROMPT.format(text=hinglish_text.strip()),
+            FUSED_INSTRUCTION,
+            generation_config=FUSED_GENERATION_CONFIG
+        )
+    data = json.loads(response.text)
+    if not isinstance(data, dict):
+        raise ValueError("Fused response is not a JSON object")
+    intent = str(data.get("intent") or "").strip()
+    if intent not in INTENT_LABELS:
+        raise ValueError(f"Unknown intent in fused response: {intent!r}")
+    if details is not None:
+        details["intent"] = intent
+        details["normalized_text"] = str(data.get("normalized_text") or "").strip()
+    if _is_no_intent(intent):
+        return WELCOME_REPLY
+    reply = _clean_response(str(data.get("reply") or ""))
+    if not reply:
+        raise ValueError("Fused response has an empty reply")
+    return reply
+
+def _try_fused_reply(hinglish_text, details=None):
+    global fused_fallbacks
+    try:
+        return _fused_reply(hinglish_text, details)
+    except Exception as e:
+        if _is_quota_error(e):
+            return QUOTA_REPLY
+        with _latency_lock:
+            fused_fallbacks += 1
+        return None
+
+_intent_sources = {"local": 0, "llm": 0}
+
+def intent_source_counts():
+    with _latency_lock:
+        return dict(_intent_sources)
+
+def _count_intent_source(source):
+    with _latency_lock:
+        _intent_sources[source] += 1
+
+def classify_intent_local(normalized_text, threshold=None):
+    if not LOCAL_INTENT_ENABLED:
+        return None
+    threshold = LOCAL_INTENT_THRESHOLD if threshold is None else threshold
+    try:
+        classifier = intent_classifier.get_classifier(block=False)
+        if classifier is None:
+            return None
+        label, confidence = classifier.predict(normalized_text)
+    except Exception:
+        return None
+    return label if confidence >= threshold else None
+
+def _parse_intent(response):
+    if not response or not hasattr(response, 'text') or not response.text:
+        return None
+    response_text = response.text.strip()
     intent = None
+    if "Intent:" in response_text:
+        intent_line = [line for line in response_text.split('\n') if 'Intent:' in line]
+        if intent_line:
+            intent = intent_line[0].split('Intent:')[-1].strip()
+    return intent or NO_INTENT_LABEL
+
+def classify_intent_llm(normalized_text):
+    return _parse_intent(_generate(INTENT_PROMPT.format(text=normalized_text), INTENT_INSTRUCTION, priority=PRIORITY_NORMAL))
+
+def _prepare_reply(hinglish_text):
+    greeting = _greeting_reply(hinglish_text)
+    if greeting:
+        return greeting, None, None
+    normalized_text = normalize_hinglish_to_english(hinglish_text)
+    with tracing.span("llm.intent_local"):
+        intent = classify_intent_local(normalized_text)
+    if intent:
+        _count_intent_source("local")
+        if _is_no_intent(intent):
+            return WELCOME_REPLY, normalized_text, None
+        return None, normalized_text, intent
+    _count_intent_source("llm")
     try:
-        model = _create_fresh_model()
-        response = model.generate_content(intent_prompt)
-        if response and hasattr(response, 'text') and response.text:
-            response_text = response.text.strip()
-            if "Intent:" in response_text:
-                intent_line = [line for line in response_text.split('\n') if 'Intent:' in line]
-                if intent_line:
-                    intent = intent_line[0].split('Intent:')[-1].strip()
-            if not intent or "no-intent" in intent.lower() or "casual greeting" in intent.lower():
-                return "Welcome, dear one. Speak what troubles your heart."
+        with tracing.span("llm.intent"):
+            intent = classify_intent_llm(normalized_text)
+        if intent is not None and _is_no_intent(intent):
+            return WELCOME_REPLY, normalized_text, None
     except Exception as e:
-        error_str = str(e).lower()
-        if "429" in error_str or "quota" in error_str or "rate limit" in error_str:
-            return "Krishna is momentarily unavailable due to API quota limits. Please try again shortly."
+        if _is_quota_error(e):
+            return QUOTA_REPLY, normalized_text, None
         intent = "Daily Struggles"
     if not intent:
         intent = "Daily Struggles"
+    return None, normalized_text, intent
+
+def krishna_reply(hinglish_text, mode=None, details=None):
+    mode = _reasoning_mode(mode)
+    started = time.perf_counter()
+    try:
+        if mode == "fused":
+            greeting = _greeting_reply(hinglish_text)
+            if greeting:
+                return greeting
+            reply = _try_fused_reply(hinglish_text, details)
+            if reply:
+                return reply
+        return _serial_reply(hinglish_text, details)
+    finally:
+        _record_latency(mode, time.perf_counter() - started)
+
+def _serial_reply(hinglish_text, details=None):
+    canned_reply, normalized_text, intent = _prepare_reply(hinglish_text)
+    if details is not None:
+        details["intent"] = intent
+        details["normalized_text"] = normalized_text
+    if canned_reply:
+        return canned_reply
+    cached = memo.get_reply(normalized_text, intent)
+    if cached:
+        return cached
     hinglish_prompt = HINGLISH_RESPONSE_PROMPT.format(
         intent=intent,
         normalized_text=normalized_text
     )
     try:
-        model = _create_fresh_model()
-        response = model.generate_content(hinglish_prompt)
+        with tracing.span("llm.generate"):
+            response = _generate(hinglish_prompt, HINGLISH_RESPONSE_INSTRUCTION)
         if response and hasattr(response, 'text') and response.text:
-            hinglish_response = response.text.strip()
-            hinglish_response = re.sub(r'^(Response:|Hinglish Response:|\"|\')', '', hinglish_response, flags=re.IGNORECASE).strip()
-            hinglish_response = hinglish_response.strip('"\'')
-            return hinglish_response if hinglish_response else "Welcome, dear one. Speak what troubles your heart."
+            hinglish_response = _clean_response(response.text)
+            memo.put_reply(normalized_text, intent, hinglish_response)
+            return hinglish_response if hinglish_response else WELCOME_REPLY
+    except Exception as e:
+        if details is not None:
+            details["error"] = f"{type(e).__name__}: {e}"
+        if _is_quota_error(e):
+            return QUOTA_REPLY
+        return WELCOME_REPLY
+    return WELCOME_REPLY
+
+def _split_sentences(buffer):
+    sentences = []
+    while True:
+        match = SENTENCE_END_RE.match(buffer)
+        if not match:
+            break
+        sentences.append(match.group(1).strip())
+        buffer = buffer[match.end():]
+    return sentences, buffer
+
+def _reply_sentences(reply):
+    sentences, tail = _split_sentences(reply + " ")
+    if tail.strip():
+        sentences.append(tail.strip())
+    return sentences
+
+def krishna_reply_stream(hinglish_text, mode=None):
+    mode = _reasoning_mode(mode)
+    started = time.perf_counter()
+    try:
+        if mode == "fused":
+            greeting = _greeting_reply(hinglish_text)
+            if greeting:
+                yield greeting
+                return
+            reply = _try_fused_reply(hinglish_text)
+            if reply in CANNED_REPLIES:
+                yield reply
+                return
+            if reply:
+                yield from _reply_sentences(reply)
+                return
+        yield from _serial_reply_stream(hinglish_text)
+    finally:
+        _record_latency(f"{mode}:stream", time.perf_counter() - started)
+
+def _serial_reply_stream(hinglish_text):
+    canned_reply, normalized_text, intent = _prepare_reply(hinglish_text)
+    if canned_reply:
+        yield canned_reply
+        return
+    cached = memo.get_reply(normalized_text, intent)
+    if cached:
+        yield from _reply_sentences(cached)
+        return
+    hinglish_prompt = HINGLISH_RESPONSE_PROMPT.format(
+        intent=intent,
+        normalized_text=normalized_text
+    )
+    produced = []
+    buffer = ""
+    chunk = None
+    started = time.perf_counter()
+    try:
+        stream = gemini_scheduler.call(
+            lambda: _get_model(HINGLISH_RESPONSE_INSTRUCTION).generate_content(hinglish_prompt, stream=True),
+            priority=PRIORITY_RESPONSE
+        )
+        for chunk in stream:
+            chunk_text = getattr(chunk, 'text', None)
+            if not chunk_text:
+                continue
+            buffer += chunk_text
+            sentences, buffer = _split_sentences(buffer)
+            for sentence in sentences:
+                sentence = sentence if produced else _clean_response(sentence)
+                if sentence:
+                    if not produced:
+                        tracing.observe("llm.generate_first_sentence", time.perf_counter() - started)
+                    produced.append(sentence)
+                    yield sentence
+        tracing.observe("llm.generate", time.perf_counter() - started)
+        if chunk is not None:
+            tracing.record_llm_call(chunk)
+        tail = buffer.strip().rstrip('"\'') if produced else _clean_response(buffer)
+        if tail:
+            produced.append(tail)
+            yield tail
     except Exception as e:
-        error_str = str(e).lower()
-        if "429" in error_str or "quota" in error_str or "rate limit" in error_str:
-            return "Krishna is momentarily unavailable due to API quota limits. Please try again shortly."
-        return "Welcome, dear one. Speak what troubles your heart."
-    return "Welcome, dear one. Speak what troubles your heart."
+        if produced:
+            return
+        yield QUOTA_REPLY if _is_quota_error(e) else WELCOME_REPLY
+        return
+    if not produced:
+        yield WELCOME_REPLY
+        return
+    memo.put_reply(normalized_text, intent, " ".join(produced))
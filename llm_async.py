@@ -0,0 +1,187 @@
+import asyncio
+import os
+import threading
+import time
+import memo
+import tracing
+from call_scheduler import PRIORITY_NORMAL, PRIORITY_OPTIONAL, PRIORITY_RESPONSE
+from clients import gemini_scheduler
+from llm import (
+    HINGLISH_RESPONSE_INSTRUCTION,
+    HINGLISH_RESPONSE_PROMPT,
+    INTENT_INSTRUCTION,
+    INTENT_PROMPT,
+    NORMALIZATION_INSTRUCTION,
+    NORMALIZATION_PROMPT,
+    QUOTA_REPLY,
+    OPTIONAL_CALL_WAIT,
+    WELCOME_REPLY,
+    _clean_normalized,
+    _clean_response,
+    _count_intent_source,
+    _flight_key,
+    _get_model,
+    _greeting_reply,
+    _is_no_intent,
+    _is_quota_error,
+    _parse_intent,
+    _record_latency,
+    classify_intent_local,
+    needs_normalization,
+)
+
+CALL_TIMEOUT = float(os.getenv("KRISHNA_LLM_TIMEOUT", "15"))
+
+class QuotaExceeded(Exception):
+    pass
+
+async def _generate(prompt, system_instruction, timeout, priority=PRIORITY_RESPONSE, wait_timeout=None):
+    try:
+        response = await asyncio.wait_for(
+            gemini_scheduler.call_async(
+                lambda: _get_model(system_instruction).generate_content_async(prompt),
+                key=_flight_key(prompt, {}, system_instruction),
+                priority=priority,
+                wait_timeout=wait_timeout
+            ),
+            timeout
+        )
+        tracing.record_llm_call(response)
+        return response
+    except Exception as e:
+        if _is_quota_error(e):
+            raise QuotaExceeded(str(e)) from e
+        raise
+
+async def normalize_async(text, timeout=CALL_TIMEOUT):
+    if not needs_normalization(text):
+        return text
+    cached = memo.get_normalized(text)
+    if cached:
+        return cached
+    try:
+        with tracing.span("llm.normalize", engine="async"):
+            response = await _generate(
+                NORMALIZATION_PROMPT.format(text=text),
+                NORMALIZATION_INSTRUCTION,
+                timeout,
+                priority=PRIORITY_OPTIONAL,
+                wait_timeout=OPTIONAL_CALL_WAIT
+            )
+    except QuotaExceeded:
+        raise
+    except Exception:
+        return text
+    if response and hasattr(response, 'text') and response.text:
+        normalized = _clean_normalized(response.text)
+        memo.put_normalized(text, normalized)
+        return normalized or text
+    return text
+
+async def classify_intent_async(text, timeout=CALL_TIMEOUT):
+    with tracing.span("llm.intent_local"):
+        intent = classify_intent_local(text)
+    if intent:
+        _count_intent_source("local")
+        return intent
+    _count_intent_source("llm")
+    try:
+        with tracing.span("llm.intent", engine="async"):
+            intent = _parse_intent(await _generate(INTENT_PROMPT.format(text=text), INTENT_INSTRUCTION, timeout, priority=PRIORITY_NORMAL))
+    except QuotaExceeded:
+        raise
+    except Exception:
+        return "Daily Struggles"
+    return intent or "Daily Struggles"
+
+async def respond_async(intent, user_text, timeout=CALL_TIMEOUT):
+    prompt = HINGLISH_RESPONSE_PROMPT.format(intent=intent, normalized_text=user_text)
+    with tracing.span("llm.generate", engine="async"):
+        response = await _generate(prompt, HINGLISH_RESPONSE_INSTRUCTION, timeout)
+    if response and hasattr(response, 'text') and response.text:
+        return _clean_response(response.text) or WELCOME_REPLY
+    return WELCOME_REPLY
+
+async def _respond_and_remember(intent, user_text, timeout):
+    reply = await respond_async(intent, user_text, timeout)
+    if reply != WELCOME_REPLY:
+        memo.put_reply(user_text, intent, reply)
+    return reply
+
+async def _cancel(*tasks):
+    pending = [task for task in tasks if task is not None and not task.done()]
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+async def _reply(text, timeout):
+    if not needs_normalization(text):
+        intent = await classify_intent_async(text, timeout)
+        if _is_no_intent(intent):
+            return WELCOME_REPLY
+        return memo.get_reply(text, intent) or await _respond_and_remember(intent, text, timeout)
+    normalize_task = asyncio.create_task(normalize_async(text, timeout))
+    raw_intent_task = asyncio.create_task(classify_intent_async(text, timeout))
+    speculative_task = None
+    try:
+        raw_intent = await raw_intent_task
+        if not _is_no_intent(raw_intent):
+            speculative_task = asyncio.create_task(respond_async(raw_intent, text, timeout))
+        normalized_text = await normalize_task
+        intent = await classify_intent_async(normalized_text, timeout)
+        if _is_no_intent(intent):
+            return WELCOME_REPLY
+        cached = memo.get_reply(normalized_text, intent)
+        if cached:
+            return cached
+        if speculative_task is not None and intent == raw_intent:
+            reply = await speculative_task
+            if reply != WELCOME_REPLY:
+                memo.put_reply(text, intent, reply)
+                if memo.is_noise_edit(text, normalized_text):
+                    memo.put_reply(normalized_text, intent, reply)
+            return reply
+        await _cancel(speculative_task)
+        return await _respond_and_remember(intent, normalized_text, timeout)
+    finally:
+        await _cancel(normalize_task, raw_intent_task, speculative_task)
+
+async def krishna_reply_async(hinglish_text, timeout=CALL_TIMEOUT):
+    greeting = _greeting_reply(hinglish_text)
+    if greeting:
+        return greeting
+    started = time.perf_counter()
+    try:
+        return await _reply(hinglish_text.strip(), timeout)
+    except QuotaExceeded:
+        return QUOTA_REPLY
+    except Exception:
+        return WELCOME_REPLY
+    finally:
+        _record_latency("async", time.perf_counter() - started)
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-async", daemon=True).start()
+                _loop = loop
+    return _loop
+
+async def _traced(active, coroutine):
+    token = tracing.attach(active)
+    try:
+        return await coroutine
+    finally:
+        tracing.detach(token)
+
+def krishna_reply_concurrent(hinglish_text, timeout=CALL_TIMEOUT):
+    coroutine = _traced(tracing.current_trace(), krishna_reply_async(hinglish_text, timeout))
+    future = asyncio.run_coroutine_threadsafe(coroutine, _get_loop())
+    return future.result()
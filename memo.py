@@ -0,0 +1,283 @@
+import difflib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+NUM_PERMUTATIONS = 32
+BANDS = 8
+SHINGLE_SIZE = 3
+SIMILARITY_THRESHOLD = 0.85
+SPELLING_VARIANT_RATIO = 0.8
+STORE_PRUNE_INTERVAL = 600.0
+FILLER_WORDS = {
+    "a", "an", "the", "um", "uh", "umm", "hmm", "like", "so", "just", "actually", "basically",
+    "please", "ji", "haan", "ok", "okay", "well", "oh", "yaar", "bas", "toh"
+}
+NEGATION_WORDS = {
+    "no", "not", "never", "nothing", "nobody", "none", "nor", "cannot", "cant", "can't", "dont", "don't",
+    "doesnt", "doesn't", "didnt", "didn't", "isnt", "isn't", "wasnt", "wasn't", "wont", "won't",
+    "nahi", "nahin", "mat", "na"
+}
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+_PERMUTATIONS = [
+    (zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode()))
+    for i in range(NUM_PERMUTATIONS)
+]
+
+def normalize_key(text):
+    text = re.sub(r"\s+", " ", (text or "").lower()).strip()
+    return text.strip(" .,!?;:\"'।")
+
+def minhash_signature(text):
+    padded = f" {text} "
+    shingles = {padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+    return tuple(
+        min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+def similarity(first, second):
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+def _tokens(text):
+    return re.findall(r"[\w']+", text.lower())
+
+def _spelling_variant(first, second):
+    if first in NEGATION_WORDS or second in NEGATION_WORDS:
+        return False
+    return difflib.SequenceMatcher(None, first, second).ratio() >= SPELLING_VARIANT_RATIO
+
+def is_noise_edit(first, second):
+    first_tokens, second_tokens = _tokens(first), _tokens(second)
+    matcher = difflib.SequenceMatcher(None, first_tokens, second_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        removed, added = first_tokens[i1:i2], second_tokens[j1:j2]
+        if tag == "replace" and len(removed) == len(added):
+            if all(_spelling_variant(old, new) for old, new in zip(removed, added)):
+                continue
+        if not all(token in FILLER_WORDS for token in removed + added):
+            return False
+    return True
+
+def _bands(signature):
+    rows = len(signature) // BANDS
+    return [(band, signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._pruned_at = time.time()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS memo ("
+                "tier TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (tier, key))"
+            )
+
+    def load(self, tier, limit):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM memo WHERE expires_at <= ?", (time.time(),))
+            rows = self._connection.execute(
+                "SELECT key, value, expires_at FROM memo WHERE tier = ? ORDER BY expires_at DESC LIMIT ?",
+                (tier, limit)
+            ).fetchall()
+        return [(json.loads(key), json.loads(value), expires_at) for key, value, expires_at in reversed(rows)]
+
+    def put(self, tier, key, value, expires_at):
+        now = time.time()
+        with self._lock, self._connection:
+            if now - self._pruned_at >= STORE_PRUNE_INTERVAL:
+                self._connection.execute("DELETE FROM memo WHERE expires_at <= ?", (now,))
+                self._pruned_at = now
+            self._connection.execute(
+                "INSERT OR REPLACE INTO memo (tier, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (tier, json.dumps(key, ensure_ascii=False), json.dumps(value, ensure_ascii=False), expires_at)
+            )
+
+    def delete(self, tier, key):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM memo WHERE tier = ? AND key = ?",
+                (tier, json.dumps(key, ensure_ascii=False))
+            )
+
+class TTLCache:
+    def __init__(self, name, maxsize, ttl, store=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if store is not None:
+            for key, value, expires_at in store.load(name, maxsize):
+                self._insert(self._key(key), value, expires_at)
+
+    def _key(self, key):
+        return tuple(key) if isinstance(key, list) else key
+
+    def _insert(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        self._on_insert(key, value)
+        while len(self._entries) > self.maxsize:
+            evicted, (evicted_value, _) = self._entries.popitem(last=False)
+            self._on_remove(evicted, evicted_value)
+            self.evictions += 1
+            if self.store is not None:
+                self.store.delete(self.name, evicted)
+
+    def _remove(self, key):
+        value, _ = self._entries.pop(key)
+        self._on_remove(key, value)
+        if self.store is not None:
+            self.store.delete(self.name, key)
+
+    def _on_insert(self, key, value):
+        pass
+
+    def _on_remove(self, key, value):
+        pass
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key):
+        with self._lock:
+            value = self._lookup(key, time.time())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._insert(key, value, expires_at)
+        if self.store is not None:
+            self.store.put(self.name, key, value, expires_at)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+class NearDuplicateCache(TTLCache):
+    def __init__(self, name, maxsize, ttl, store=None, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.near_hits = 0
+        self._signatures = {}
+        self._buckets = {}
+        super().__init__(name, maxsize, ttl, store)
+
+    def _on_insert(self, key, value):
+        text, scope = key
+        signature = minhash_signature(text)
+        self._signatures[key] = signature
+        for band in _bands(signature):
+            self._buckets.setdefault((scope, band), set()).add(key)
+
+    def _on_remove(self, key, value):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band in _bands(signature):
+            bucket = self._buckets.get((key[1], band))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[(key[1], band)]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            value = self._lookup(key, now)
+            if value is not None:
+                self.hits += 1
+                return value
+            text, scope = key
+            signature = minhash_signature(text)
+            candidates = set()
+            for band in _bands(signature):
+                candidates.update(self._buckets.get((scope, band), ()))
+            best_key, best_score = None, self.threshold
+            for candidate in candidates:
+                score = similarity(signature, self._signatures[candidate])
+                if score >= best_score and is_noise_edit(text, candidate[0]):
+                    best_key, best_score = candidate, score
+            if best_key is not None:
+                value = self._lookup(best_key, now)
+                if value is not None:
+                    self.near_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def stats(self):
+        stats = super().stats()
+        stats["near_hits"] = self.near_hits
+        return stats
+
+MEMO_ENABLED = os.getenv("KRISHNA_MEMO", "1") != "0"
+MEMO_DB_PATH = os.getenv("KRISHNA_MEMO_DB", "")
+NORMALIZATION_TTL = float(os.getenv("KRISHNA_MEMO_NORMALIZATION_TTL", str(7 * 24 * 3600)))
+REPLY_TTL = float(os.getenv("KRISHNA_MEMO_REPLY_TTL", str(24 * 3600)))
+NORMALIZATION_MAXSIZE = 4096
+REPLY_MAXSIZE = 2048
+
+_store = SQLiteStore(MEMO_DB_PATH) if MEMO_ENABLED and MEMO_DB_PATH else None
+normalization_cache = TTLCache("normalization", NORMALIZATION_MAXSIZE, NORMALIZATION_TTL, _store)
+reply_cache = NearDuplicateCache("reply", REPLY_MAXSIZE, REPLY_TTL, _store)
+
+def get_normalized(text):
+    if not MEMO_ENABLED:
+        return None
+    return normalization_cache.get(normalize_key(text))
+
+def put_normalized(text, normalized):
+    if MEMO_ENABLED and normalized:
+        normalization_cache.put(normalize_key(text), normalized)
+
+def get_reply(normalized_text, intent):
+    if not MEMO_ENABLED:
+        return None
+    return reply_cache.get((normalize_key(normalized_text), intent))
+
+def put_reply(normalized_text, intent, reply):
+    if MEMO_ENABLED and reply:
+        reply_cache.put((normalize_key(normalized_text), intent), reply)
+
+def memo_stats():
+    return {
+        "normalization": normalization_cache.stats(),
+        "reply": reply_cache.stats()
+    }
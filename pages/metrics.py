@@ -0,0 +1,71 @@
+import streamlit as st
+import memo
+import stt
+import tracing
+import tts
+from clients import context_cache_stats, scheduler_stats
+from llm import latency_summary
+
+COUNT_HISTOGRAMS = {"request.llm_calls", "request.tokens", "llm.prompt_tokens", "llm.cached_tokens", "stt.batch_size"}
+
+st.set_page_config(page_title="Krishna Metrics", layout="wide")
+
+st.title("Pipeline metrics")
+st.caption(f"Traces are appended to {tracing.TRACE_LOG_PATH or 'nowhere (KRISHNA_TRACE_LOG is empty)'}")
+
+snapshot = tracing.snapshot()
+rows = []
+for name, stats in sorted(snapshot["histograms"].items()):
+    scale = 1 if name in COUNT_HISTOGRAMS else 1000
+    row = {"stage": name, "unit": "count" if scale == 1 else "ms", "count": stats["count"]}
+    for key in ("mean", "p50", "p95", "p99"):
+        row[key] = round(stats[key] * scale, 2)
+    rows.append(row)
+
+st.subheader("Stage latency")
+if rows:
+    st.dataframe(rows, use_container_width=True)
+else:
+    st.info("No requests traced yet.")
+
+st.subheader("Reply latency by reasoning mode")
+latency = latency_summary()
+mode_rows = [
+    {"mode": mode, "count": stats["count"], **{key: round(stats[key] * 1000, 2) for key in ("mean", "p50", "p95")}}
+    for mode, stats in sorted(latency.items())
+    if isinstance(stats, dict)
+]
+if mode_rows:
+    st.dataframe(mode_rows, use_container_width=True)
+else:
+    st.info("No replies generated yet.")
+st.caption(f"Fused replies that fell back to the serial chain: {latency['fused_fallbacks']}")
+
+st.subheader("Counters")
+st.json(snapshot["counters"])
+
+st.subheader("Upstream call schedulers")
+st.json(scheduler_stats())
+
+st.subheader("Whisper batch scheduler")
+whisper_scheduler = stt.scheduler_stats()
+if whisper_scheduler is None:
+    st.info("The Whisper scheduler has not started yet.")
+else:
+    st.metric("Queue depth", whisper_scheduler["queue_depth"])
+    st.json(whisper_scheduler)
+
+st.subheader("TTS audio cache")
+tts_cache = tts.cache_stats()
+lookups = tts_cache["hits"] + tts_cache["misses"]
+st.caption(f"Hit rate: {tts_cache['hits'] / lookups:.1%}" if lookups else "No lookups yet.")
+st.json(tts_cache)
+
+st.subheader("Normalization and reply memo")
+st.json(memo.memo_stats())
+
+st.subheader("Gemini context caches")
+st.json(context_cache_stats())
+
+with st.expander("Prometheus exposition"):
+    st.code(tracing.prometheus_text(), language="text")
@@ -0,0 +1,45 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+DEFAULT_SIZES = ["tiny", "base", "small"]
+
+def profile_in_process(size, warmup):
+    started = time.perf_counter()
+    import stt
+    import_seconds = time.perf_counter() - started
+    if warmup:
+        stt.warm_up(size)
+    else:
+        stt.get_model(size)
+    stats = stt.model_stats()[size]
+    stats["size"] = size
+    stats["import_seconds"] = import_seconds
+    stats["startup_seconds"] = time.perf_counter() - started
+    return stats
+
+def profile_in_subprocess(size, warmup):
+    command = [sys.executable, __file__, "--child", size]
+    if not warmup:
+        command.append("--no-warmup")
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"size": size, "error": completed.stderr.strip().splitlines()[-1:] or ["unknown error"]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Report Whisper startup time and resident memory per model size.")
+    parser.add_argument("sizes", nargs="*", default=DEFAULT_SIZES)
+    parser.add_argument("--no-warmup", action="store_true", help="skip the silent warm-up inference")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(profile_in_process(args.child, not args.no_warmup)))
+        return
+    results = [profile_in_subprocess(size, not args.no_warmup) for size in args.sizes]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
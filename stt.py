@@ -1,11 +1,90 @@
 import whisper
 import soundfile as sf
 import numpy as np
+import io
+import multiprocessing
 import os
 import tempfile
 import shutil
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+import tracing
+import vad
+from whisper_scheduler import InferenceScheduler
 
-model = whisper.load_model("tiny")
+SAMPLE_RATE = 16000
+MODEL_SIZE = os.getenv("KRISHNA_WHISPER_MODEL", "tiny")
+WARMUP_SECONDS = 1.0
+VAD_ENABLED = os.getenv("KRISHNA_VAD", "1") != "0"
+STT_WORKERS = int(os.getenv("KRISHNA_STT_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+MAX_CHUNK_SECONDS = 30.0
+PROMPT_CONTEXT_CHARS = 200
+POOL_WARMUP_TIMEOUT = 600.0
+BATCHING_ENABLED = os.getenv("KRISHNA_STT_BATCHING", "1") != "0"
+BATCH_SIZE = int(os.getenv("KRISHNA_STT_BATCH_SIZE", "8"))
+BATCH_WAIT_MS = float(os.getenv("KRISHNA_STT_BATCH_WAIT_MS", "30"))
+INITIAL_PROMPT = "Hinglish conversation mixing Hindi and English naturally. Speaker uses both languages interchangeably."
+FALLBACK_INITIAL_PROMPT = "Hinglish conversation mixing Hindi and English naturally."
+PCM_SCALES = {1: 128.0, 2: 32768.0, 4: 2147483648.0}
+PCM_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+_models = {}
+_model_stats = {}
+_model_lock = threading.Lock()
+_inference_locks = {}
+
+def _resident_memory_bytes():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    except ImportError:
+        return None
+
+def get_model(size=None):
+    size = size or MODEL_SIZE
+    loaded = _models.get(size)
+    if loaded is not None:
+        return loaded
+    with _model_lock:
+        if size not in _models:
+            rss_before = _resident_memory_bytes()
+            started = time.perf_counter()
+            _models[size] = whisper.load_model(size)
+            rss_after = _resident_memory_bytes()
+            _model_stats[size] = {
+                "load_seconds": time.perf_counter() - started,
+                "rss_bytes": rss_after,
+                "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            }
+        return _models[size]
+
+def inference_lock(size=None):
+    size = size or MODEL_SIZE
+    with _model_lock:
+        return _inference_locks.setdefault(size, threading.Lock())
+
+def warm_up(size=None, seconds=WARMUP_SECONDS):
+    size = size or MODEL_SIZE
+    loaded = get_model(size)
+    started = time.perf_counter()
+    with inference_lock(size):
+        loaded.transcribe(np.zeros(int(SAMPLE_RATE * seconds), dtype=np.float32), language="en", temperature=0.0)
+    with _model_lock:
+        _model_stats[size]["warmup_seconds"] = time.perf_counter() - started
+    return loaded
+
+def model_stats():
+    with _model_lock:
+        return {size: dict(stats) for size, stats in _model_stats.items()}
 
 def _check_ffmpeg_available():
     return shutil.which("ffmpeg") is not None
@@ -29,7 +108,41 @@ def _setup_ffmpeg_path():
             return True
     return False
 
-def transcribe(audio_path):
+def _decode_pcm_wav(audio_bytes):
+    with wave.open(io.BytesIO(audio_bytes), "rb") as wav:
+        channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        sample_rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    if sample_width not in PCM_DTYPES:
+        raise wave.Error(f"Unsupported PCM sample width: {sample_width}")
+    audio_data = np.frombuffer(frames, dtype=PCM_DTYPES[sample_width]).astype(np.float32)
+    if sample_width == 1:
+        audio_data -= 128.0
+    audio_data /= PCM_SCALES[sample_width]
+    if channels > 1:
+        audio_data = audio_data.reshape(-1, channels)
+    return audio_data, sample_rate
+
+def _decode_audio_bytes(audio_bytes):
+    try:
+        return _decode_pcm_wav(audio_bytes)
+    except (wave.Error, EOFError, ValueError):
+        pass
+    return sf.read(io.BytesIO(audio_bytes), dtype='float32')
+
+def _read_audio_input(audio):
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        audio_bytes = bytes(audio)
+    elif hasattr(audio, "read"):
+        audio_bytes = audio.read()
+    else:
+        raise ValueError("Invalid audio: expected a file path, bytes or a readable buffer")
+    if not audio_bytes:
+        raise ValueError("Audio data is empty")
+    return audio_bytes
+
+def _validate_audio_path(audio_path):
     if not audio_path or not isinstance(audio_path, str):
         raise ValueError("Invalid audio_path: must be a non-empty string")
     audio_path = os.path.normpath(os.path.abspath(audio_path))
@@ -41,119 +154,218 @@ def transcribe(audio_path):
         raise PermissionError(f"Cannot read audio file: {audio_path}")
     if os.path.getsize(audio_path) == 0:
         raise ValueError(f"Audio file is empty: {audio_path}")
-    processed_audio_path = None
-    try:
-        try:
-            audio_data, sample_rate = sf.read(audio_path, dtype='float32')
-        except Exception as read_error:
-            try:
-                result = model.transcribe(
-                    audio_path, 
-                    language=None,
-                    initial_prompt="Hinglish conversation mixing Hindi and English naturally."
-                )
-                return result["text"].strip()
-            except FileNotFoundError:
-                raise FileNotFoundError(
-                    f"Cannot read audio file with soundfile or ffmpeg. "
-                    f"Soundfile error: {str(read_error)}. "
-                    f"Please ensure audio file is in a supported format (WAV, MP3, etc.)"
-                ) from read_error
-        audio_data = np.asarray(audio_data, dtype=np.float32)
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1, dtype=np.float32)
-        audio_data = audio_data.flatten().astype(np.float32)
-        max_val = np.max(np.abs(audio_data))
-        if max_val > 0:
-            audio_data = (audio_data / max_val).astype(np.float32)
-        if sample_rate != 16000:
-            num_samples = int(len(audio_data) * 16000 / sample_rate)
-            indices = np.linspace(0, len(audio_data) - 1, num_samples, dtype=np.float32)
-            audio_data = np.interp(
-                indices, 
-                np.arange(len(audio_data), dtype=np.float32), 
-                audio_data
-            ).astype(np.float32)
-            sample_rate = 16000
-        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
-        if audio_data.dtype != np.float32:
-            audio_data = audio_data.astype(np.float32)
-        if not audio_data.flags['C_CONTIGUOUS']:
-            audio_data = np.ascontiguousarray(audio_data)
-        try:
-            result = model.transcribe(
-                audio_data,
-                language=None,
-                initial_prompt="Hinglish conversation mixing Hindi and English naturally. Speaker uses both languages interchangeably.",
-                task="transcribe",
-                temperature=0.0,
-                best_of=1,
-                beam_size=5
-            )
-            return result["text"].strip()
-        except (TypeError, ValueError, AttributeError, RuntimeError) as array_error:
-            fallback_audio_path = None
-            try:
-                temp_dir = tempfile.gettempdir()
-                with tempfile.NamedTemporaryFile(
-                    delete=False, 
-                    suffix=".wav",
-                    dir=temp_dir
-                ) as temp_file:
-                    fallback_audio_path = temp_file.name
-                sf.write(fallback_audio_path, audio_data, sample_rate, format='WAV', subtype='PCM_16')
-                if not os.path.exists(fallback_audio_path) or os.path.getsize(fallback_audio_path) == 0:
-                    raise RuntimeError("Failed to create processed audio file")
-                _setup_ffmpeg_path()
-                result = model.transcribe(
-                    fallback_audio_path,
-                    language=None,
-                    initial_prompt="Hinglish conversation mixing Hindi and English naturally."
+    return audio_path
+
+def to_mono_16k(audio_data, sample_rate):
+    audio_data = np.asarray(audio_data, dtype=np.float32)
+    if len(audio_data.shape) > 1:
+        audio_data = np.mean(audio_data, axis=1, dtype=np.float32)
+    audio_data = audio_data.flatten().astype(np.float32)
+    if sample_rate != SAMPLE_RATE:
+        num_samples = int(len(audio_data) * SAMPLE_RATE / sample_rate)
+        indices = np.linspace(0, len(audio_data) - 1, num_samples, dtype=np.float32)
+        audio_data = np.interp(
+            indices,
+            np.arange(len(audio_data), dtype=np.float32),
+            audio_data
+        ).astype(np.float32)
+    return np.ascontiguousarray(audio_data, dtype=np.float32)
+
+def normalize_peak(audio_data):
+    max_val = np.max(np.abs(audio_data)) if audio_data.size else 0
+    if max_val > 0:
+        audio_data = (audio_data / max_val).astype(np.float32)
+    return np.ascontiguousarray(audio_data, dtype=np.float32)
+
+def preprocess_audio(audio_data, sample_rate):
+    return normalize_peak(to_mono_16k(audio_data, sample_rate))
+
+def _transcribe_array(audio_data, initial_prompt=INITIAL_PROMPT):
+    model = get_model()
+    with inference_lock():
+        result = model.transcribe(
+            audio_data,
+            language=None,
+            initial_prompt=initial_prompt,
+            task="transcribe",
+            temperature=0.0,
+            best_of=1,
+            beam_size=5
+        )
+    return result["text"].strip()
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = InferenceScheduler(
+                    get_model,
+                    max_batch_size=BATCH_SIZE,
+                    max_wait_ms=BATCH_WAIT_MS,
+                    lock=inference_lock()
                 )
-                return result["text"].strip()
-            except FileNotFoundError as ffmpeg_error:
-                raise FileNotFoundError(
-                    "ffmpeg is required for audio transcription but was not found.\n"
-                    "Please install ffmpeg:\n"
-                    "1. Download from https://ffmpeg.org/download.html\n"
-                    "2. Extract to C:\\ffmpeg\n"
-                    "3. Add C:\\ffmpeg\\bin to your system PATH\n"
-                    "OR install via: winget install ffmpeg\n"
-                    f"Original array error: {str(array_error)}"
-                ) from ffmpeg_error
-            finally:
-                if fallback_audio_path and os.path.exists(fallback_audio_path):
-                    try:
-                        os.remove(fallback_audio_path)
-                    except Exception:
-                        pass
-    except FileNotFoundError as e:
-        raise FileNotFoundError(
-            f"Failed to transcribe audio: {str(e)}. "
-            f"Audio file exists at {audio_path} but cannot be processed."
-        ) from e
-    except Exception as e:
-        try:
+    return _scheduler
+
+def scheduler_stats():
+    return get_scheduler().stats() if _scheduler is not None else None
+
+def _transcribe_short(audio_data, initial_prompt=INITIAL_PROMPT):
+    if BATCHING_ENABLED:
+        return get_scheduler().transcribe(audio_data, initial_prompt)
+    return _transcribe_array(audio_data, initial_prompt)
+
+def _transcribe_with_ffmpeg(audio_path, original_error):
+    _setup_ffmpeg_path()
+    try:
+        model = get_model()
+        with inference_lock():
             result = model.transcribe(
                 audio_path,
                 language=None,
-                initial_prompt="Hinglish conversation mixing Hindi and English naturally."
+                initial_prompt=FALLBACK_INITIAL_PROMPT
             )
-            return result["text"].strip()
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                f"Transcription failed. Audio file exists but cannot be processed. "
-                f"Original error: {str(e)}. "
-                f"Ensure audio file is in a valid format (WAV, MP3, etc.)."
-            ) from e
-        except Exception as fallback_error:
-            raise RuntimeError(
-                f"Transcription failed: {str(fallback_error)}. "
-                f"Original error: {str(e)}"
-            ) from fallback_error
+        return result["text"].strip()
+    except FileNotFoundError as ffmpeg_error:
+        raise FileNotFoundError(
+            "ffmpeg is required to decode this audio format but was not found.\n"
+            "Please install ffmpeg:\n"
+            "1. Download from https://ffmpeg.org/download.html\n"
+            "2. Extract to C:\\ffmpeg\n"
+            "3. Add C:\\ffmpeg\\bin to your system PATH\n"
+            "OR install via: winget install ffmpeg\n"
+            f"Decoder error: {str(original_error)}"
+        ) from ffmpeg_error
+
+def _transcribe_bytes_with_ffmpeg(audio_bytes, original_error):
+    fallback_audio_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".audio") as temp_file:
+            temp_file.write(audio_bytes)
+            fallback_audio_path = temp_file.name
+        return _transcribe_with_ffmpeg(fallback_audio_path, original_error)
     finally:
-        if processed_audio_path and os.path.exists(processed_audio_path):
+        if fallback_audio_path and os.path.exists(fallback_audio_path):
             try:
-                os.remove(processed_audio_path)
+                os.remove(fallback_audio_path)
             except Exception:
                 pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _init_worker(size, threads):
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    get_model(size)
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                threads = max(1, (os.cpu_count() or 1) // STT_WORKERS)
+                _pool = ProcessPoolExecutor(
+                    max_workers=STT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(MODEL_SIZE, threads)
+                )
+    return _pool
+
+def _worker_pid(hold_seconds):
+    time.sleep(hold_seconds)
+    return os.getpid()
+
+def warm_up_pool(timeout=POOL_WARMUP_TIMEOUT):
+    if STT_WORKERS <= 1:
+        return None
+    pool = _get_pool()
+    ready = set()
+    deadline = time.monotonic() + timeout
+    while len(ready) < STT_WORKERS and time.monotonic() < deadline:
+        ready.update(future.result() for future in [pool.submit(_worker_pid, 0.1) for _ in range(STT_WORKERS)])
+    return pool
+
+def _chunk_prompt(previous_text):
+    if not previous_text:
+        return INITIAL_PROMPT
+    return f"{INITIAL_PROMPT} {previous_text[-PROMPT_CONTEXT_CHARS:]}"
+
+def _transcribe_lane(chunks):
+    texts = []
+    previous_text = ""
+    for chunk in chunks:
+        previous_text = _transcribe_array(chunk, _chunk_prompt(previous_text))
+        texts.append(previous_text)
+    return texts
+
+def _transcribe_long(audio_data, segments):
+    windows = vad.split_windows(audio_data, segments, SAMPLE_RATE, MAX_CHUNK_SECONDS)
+    chunks = [np.ascontiguousarray(audio_data[start:end]) for start, end in windows]
+    lane_count = min(STT_WORKERS, len(chunks))
+    if lane_count <= 1:
+        texts = _transcribe_lane(chunks)
+    else:
+        bounds = np.linspace(0, len(chunks), lane_count + 1).astype(int)
+        pool = _get_pool()
+        futures = [pool.submit(_transcribe_lane, chunks[low:high]) for low, high in zip(bounds[:-1], bounds[1:])]
+        texts = [text for future in futures for text in future.result()]
+    return " ".join(text for text in texts if text).strip()
+
+def _result(text, segments=None, duration=None):
+    speech_duration = None
+    if segments is not None:
+        speech_duration = sum(segment["end"] - segment["start"] for segment in segments)
+    return {
+        "text": text,
+        "segments": segments,
+        "duration": duration,
+        "speech_duration": speech_duration
+    }
+
+def transcribe_detailed(audio):
+    if isinstance(audio, str):
+        audio_path = _validate_audio_path(audio)
+        try:
+            with tracing.span("stt.decode", source="file"):
+                audio_data, sample_rate = sf.read(audio_path, dtype='float32')
+        except Exception as read_error:
+            with tracing.span("stt.inference", mode="ffmpeg"):
+                return _result(_transcribe_with_ffmpeg(audio_path, read_error))
+    else:
+        audio_bytes = _read_audio_input(audio)
+        try:
+            with tracing.span("stt.decode", source="bytes"):
+                audio_data, sample_rate = _decode_audio_bytes(audio_bytes)
+        except Exception as read_error:
+            with tracing.span("stt.inference", mode="ffmpeg"):
+                return _result(_transcribe_bytes_with_ffmpeg(audio_bytes, read_error))
+    with tracing.span("stt.preprocess"):
+        audio_data = to_mono_16k(audio_data, sample_rate)
+    duration = len(audio_data) / SAMPLE_RATE
+    if VAD_ENABLED:
+        with tracing.span("stt.vad"):
+            segments = vad.detect_speech(audio_data, SAMPLE_RATE)
+        if not segments:
+            return _result("", segments, duration)
+    else:
+        segments = [{"start_sample": 0, "end_sample": len(audio_data), "start": 0.0, "end": duration}]
+    try:
+        if segments[-1]["end"] - segments[0]["start"] > MAX_CHUNK_SECONDS:
+            with tracing.span("stt.inference", mode="long"):
+                return _result(_transcribe_long(normalize_peak(audio_data), segments), segments, duration)
+        audio_data = vad.trim(audio_data, segments)
+        with tracing.span("stt.inference", mode="batched" if BATCHING_ENABLED else "direct"):
+            return _result(_transcribe_short(normalize_peak(audio_data)), segments, duration)
+    except Exception as e:
+        raise RuntimeError(f"Transcription failed: {str(e)}") from e
+
+def transcribe(audio):
+    return transcribe_detailed(audio)["text"]
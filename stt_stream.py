@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import stt
+import tracing
+import vad
+
+PARTIAL_STEP_MS = float(os.getenv("KRISHNA_STT_PARTIAL_STEP_MS", "600"))
+ENDPOINT_SILENCE_MS = float(os.getenv("KRISHNA_STT_ENDPOINT_MS", "800"))
+WINDOW_SECONDS = min(stt.MAX_CHUNK_SECONDS, float(os.getenv("KRISHNA_STT_STREAM_WINDOW", "25")))
+LEADING_SILENCE_SECONDS = 1.0
+
+class StreamingTranscriber:
+    def __init__(self, partial_step_ms=PARTIAL_STEP_MS, endpoint_silence_ms=ENDPOINT_SILENCE_MS, window_seconds=WINDOW_SECONDS):
+        self.step_samples = int(stt.SAMPLE_RATE * partial_step_ms / 1000)
+        self.endpoint_samples = int(stt.SAMPLE_RATE * max(0.0, endpoint_silence_ms - vad.PADDING_MS) / 1000)
+        self.window_samples = int(stt.SAMPLE_RATE * window_seconds)
+        self.padding_samples = int(stt.SAMPLE_RATE * vad.PADDING_MS / 1000)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="krishna-stt-stream")
+        self._events = []
+        self._pending = None
+        self._generation = 0
+        self._reset()
+
+    def _reset(self):
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._committed = []
+        self._hypothesis = ""
+        self._hypothesis_end = 0
+        self._submitted_end = 0
+        self._rolled = False
+
+    def _text(self, hypothesis):
+        return " ".join(text for text in self._committed + [hypothesis] if text).strip()
+
+    def _decode(self, audio):
+        prompt = stt._chunk_prompt(" ".join(self._committed))
+        return stt._transcribe_short(stt.normalize_peak(audio), prompt)
+
+    def _submit(self, fn, *args):
+        self._pending = self._executor.submit(tracing.wrap(fn), *args)
+
+    def _partial_job(self, generation, audio, end):
+        started = time.perf_counter()
+        text = self._decode(audio)
+        tracing.observe("stt.partial", time.perf_counter() - started)
+        with self._lock:
+            if generation != self._generation or end < self._hypothesis_end:
+                return
+            self._hypothesis = text
+            self._hypothesis_end = end
+            self._events.append({"type": "partial", "text": self._text(text)})
+
+    def _commit_job(self, generation, audio):
+        text = self._decode(audio)
+        with self._lock:
+            if generation == self._generation:
+                self._committed.append(text)
+
+    def _roll_window(self, start):
+        search = min(self.window_samples // 2, int(vad.CUT_SEARCH_SECONDS * stt.SAMPLE_RATE))
+        high = start + self.window_samples
+        cut = vad._quietest_cut(self._audio, high - search, high, stt.SAMPLE_RATE)
+        head = self._audio[start:cut].copy()
+        self._audio = self._audio[cut:]
+        self._hypothesis = ""
+        self._hypothesis_end = 0
+        self._submitted_end = 0
+        self._rolled = True
+        self._generation += 1
+        self._submit(self._commit_job, self._generation, head)
+
+    def _finalize(self, segments):
+        endpoint_at = time.perf_counter()
+        pending = self._pending
+        if pending is not None:
+            try:
+                pending.result()
+            except Exception:
+                pass
+        speech_start = segments[0]["start_sample"]
+        speech_end = segments[-1]["end_sample"]
+        with self._lock:
+            covered = self._hypothesis_end >= speech_end - self.padding_samples
+            hypothesis = self._hypothesis
+        if not covered:
+            hypothesis = self._decode(self._audio[speech_start:speech_end])
+        with self._lock:
+            text = self._text(hypothesis)
+            self._generation += 1
+            self._events = [event for event in self._events if event["type"] != "partial"]
+            self._reset()
+            self._pending = None
+        latency = time.perf_counter() - endpoint_at
+        tracing.observe("stt.endpoint_to_final", latency)
+        return {"type": "final", "text": text, "latency": latency, "reused_partial": covered}
+
+    def _drain(self):
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+    def feed(self, chunk, sample_rate):
+        audio = stt.to_mono_16k(chunk, sample_rate)
+        with self._lock:
+            self._audio = np.concatenate((self._audio, audio))
+        segments = vad.detect_speech(self._audio, stt.SAMPLE_RATE)
+        if not segments:
+            if self._rolled:
+                if len(self._audio) >= self.endpoint_samples + self.padding_samples:
+                    return self._drain() + [self._finalize([{"start_sample": 0, "end_sample": 0}])]
+                return self._drain()
+            keep = int(LEADING_SILENCE_SECONDS * stt.SAMPLE_RATE)
+            with self._lock:
+                if len(self._audio) > keep:
+                    self._audio = self._audio[-keep:]
+            return self._drain()
+        if len(self._audio) - segments[-1]["end_sample"] >= self.endpoint_samples:
+            final = self._finalize(segments)
+            return self._drain() + [final]
+        start = segments[0]["start_sample"]
+        if len(self._audio) - start > self.window_samples:
+            with self._lock:
+                self._roll_window(start)
+            return self._drain()
+        end = len(self._audio)
+        if end - self._submitted_end >= self.step_samples and (self._pending is None or self._pending.done()):
+            self._submitted_end = end
+            self._submit(self._partial_job, self._generation, self._audio[start:end].copy(), end)
+        return self._drain()
+
+    def flush(self):
+        segments = vad.detect_speech(self._audio, stt.SAMPLE_RATE) if len(self._audio) else []
+        if not segments and not self._rolled:
+            with self._lock:
+                self._generation += 1
+                self._reset()
+            return self._drain()
+        if not segments:
+            segments = [{"start_sample": 0, "end_sample": 0}]
+        return self._drain() + [self._finalize(segments)]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
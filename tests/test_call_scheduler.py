@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+import pytest
+import call_scheduler
+from call_scheduler import CallScheduler, TokenBucket, retry_after_seconds
+
+class _Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class _HTTPError(Exception):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+def test_retry_after_header():
+    assert retry_after_seconds(_HTTPError("429", _Response(429, {"Retry-After": "7"}))) == 7.0
+
+def test_retry_after_grpc_retry_delay():
+    message = "429 Resource has been exhausted\nretry_delay {\n  seconds: 23\n}\n"
+    assert retry_after_seconds(Exception(message)) == 23.0
+
+def test_retry_after_message_hint():
+    assert retry_after_seconds(Exception("Quota exceeded. Please retry in 2.5s.")) == 2.5
+
+def test_retry_after_missing():
+    assert retry_after_seconds(Exception("500 internal error")) is None
+
+def test_bucket_serves_higher_priority_first():
+    bucket = TokenBucket(rate=10, capacity=1)
+    assert bucket.acquire()
+    order = []
+
+    def wait(priority):
+        bucket.acquire(priority)
+        order.append(priority)
+
+    low = threading.Thread(target=wait, args=(call_scheduler.PRIORITY_OPTIONAL,))
+    low.start()
+    time.sleep(0.02)
+    high = threading.Thread(target=wait, args=(call_scheduler.PRIORITY_RESPONSE,))
+    high.start()
+    low.join()
+    high.join()
+    assert order == [call_scheduler.PRIORITY_RESPONSE, call_scheduler.PRIORITY_OPTIONAL]
+
+def test_identical_calls_share_one_upstream_request():
+    scheduler = CallScheduler("test", 0, 1)
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.1)
+        return "reply"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scheduler.call(upstream, key="same"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["reply"] * 5
+    assert len(calls) == 1
+    assert scheduler.stats()["coalesced"] == 4
+
+def test_retries_transient_errors():
+    scheduler = CallScheduler("test", 0, 1, base_delay=0.01)
+    attempts = []
+
+    def upstream():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _HTTPError("503", _Response(503))
+        return "ok"
+
+    assert scheduler.call(upstream) == "ok"
+    assert scheduler.stats()["retries"] == 2
+
+def test_long_retry_after_fails_fast():
+    scheduler = CallScheduler("test", 0, 1, retry_budget=1.0)
+
+    def upstream():
+        raise _HTTPError("429 quota", _Response(429, {"Retry-After": "3600"}))
+
+    started = time.monotonic()
+    with pytest.raises(_HTTPError):
+        scheduler.call(upstream, priority=call_scheduler.PRIORITY_RESPONSE)
+    assert time.monotonic() - started < 1.0
+
+def test_cancelled_async_leader_does_not_cancel_followers():
+    scheduler = CallScheduler("test", 0, 1)
+
+    async def upstream():
+        await asyncio.sleep(0.3)
+        return "reply"
+
+    async def scenario():
+        leader = asyncio.wait_for(scheduler.call_async(upstream, key="same"), 0.1)
+        follower = asyncio.wait_for(scheduler.call_async(upstream, key="same"), 5)
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(scenario())
+    assert isinstance(leader_result, asyncio.TimeoutError)
+    assert follower_result == "reply"
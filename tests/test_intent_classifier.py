@@ -0,0 +1,8 @@
+import evaluate_intent
+import intent_classifier
+
+def test_held_out_precision_at_default_threshold():
+    records = evaluate_intent.load_records(intent_classifier.EXAMPLES_PATH)
+    report = evaluate_intent.cross_validate(records, 5, intent_classifier.DEFAULT_THRESHOLD)
+    assert report["handled_share"] >= 0.25
+    assert report["accuracy_handled"] >= 0.9
@@ -0,0 +1,37 @@
+import memo
+
+def _cache():
+    return memo.NearDuplicateCache("test", 16, 3600)
+
+def test_near_duplicate_hit_for_asr_noise():
+    cache = _cache()
+    cache.put(("i feel lost in my career", "Career/Purpose"), "reply")
+    assert cache.get(("um i feel lost in my carrer", "Career/Purpose")) == "reply"
+
+def test_negation_is_not_a_near_duplicate():
+    cache = _cache()
+    cache.put(("i don't want to marry the girl my parents chose for me", "Relationships"), "reply")
+    assert cache.get(("i want to marry the girl my parents chose for me", "Relationships")) is None
+
+def test_reordered_roles_are_not_a_near_duplicate():
+    cache = _cache()
+    cache.put(("i lied to my best friend and i feel guilty", "Inner Conflict"), "reply")
+    assert cache.get(("my best friend lied to me and i feel guilty", "Inner Conflict")) is None
+
+def _row_count(store):
+    return store._connection.execute("SELECT COUNT(*) FROM memo").fetchone()[0]
+
+def test_evicted_entries_are_deleted_from_the_store(tmp_path):
+    store = memo.SQLiteStore(str(tmp_path / "memo.db"))
+    cache = memo.TTLCache("test", 2, 3600, store)
+    for text in ("one", "two", "three"):
+        cache.put(text, text.upper())
+    assert _row_count(store) == 2
+    assert [key for key, _, _ in store.load("test", 10)] == ["two", "three"]
+
+def test_expired_rows_are_pruned_on_write(tmp_path, monkeypatch):
+    store = memo.SQLiteStore(str(tmp_path / "memo.db"))
+    store.put("test", "stale", "value", 1.0)
+    monkeypatch.setattr(memo, "STORE_PRUNE_INTERVAL", 0.0)
+    store.put("test", "fresh", "value", 1e12)
+    assert _row_count(store) == 1
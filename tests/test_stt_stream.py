@@ -0,0 +1,42 @@
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip("whisper")
+pytest.importorskip("soundfile")
+
+import stt
+import stt_stream
+
+SAMPLE_RATE = 16000
+
+def _signal(seconds, speech, rng):
+    samples = int(seconds * SAMPLE_RATE)
+    audio = rng.normal(0, 0.001, samples)
+    if speech:
+        audio += 0.3 * np.sin(np.arange(samples) * 2 * np.pi * 220 / SAMPLE_RATE)
+    return audio.astype(np.float32)
+
+def _fake_transcribe(audio, initial_prompt=None):
+    time.sleep(0.05)
+    return f"[{len(audio) / SAMPLE_RATE:.1f}s]"
+
+def test_final_transcript_covers_all_audio_across_window_rolls(monkeypatch):
+    monkeypatch.setattr(stt, "_transcribe_short", _fake_transcribe)
+    rng = np.random.default_rng(0)
+    audio = np.concatenate([_signal(0.5, False, rng), _signal(32, True, rng), _signal(1.5, False, rng)])
+    transcriber = stt_stream.StreamingTranscriber(window_seconds=10)
+    finals = []
+    try:
+        for offset in range(0, len(audio), 320):
+            for event in transcriber.feed(audio[offset:offset + 320], SAMPLE_RATE):
+                if event["type"] == "final":
+                    finals.append(event)
+            time.sleep(0.001)
+    finally:
+        transcriber.close()
+    assert len(finals) == 1
+    pieces = [float(piece.strip("[]s")) for piece in finals[0]["text"].split()]
+    assert len(pieces) == 4
+    assert all(piece <= 10.0 for piece in pieces)
+    assert sum(pieces) == pytest.approx(32.0, abs=1.0)
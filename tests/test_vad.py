@@ -0,0 +1,25 @@
+import numpy as np
+import vad
+
+SAMPLE_RATE = 16000
+
+def _clip(peak, noise, seed=0):
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    burst = np.sin(2 * np.pi * 220 * t) * np.hanning(SAMPLE_RATE)
+    audio = np.concatenate((np.zeros(SAMPLE_RATE), burst, np.zeros(SAMPLE_RATE))) * peak
+    return (audio + np.random.default_rng(seed).normal(0, noise, audio.size)).astype(np.float32)
+
+def test_quiet_unnormalized_speech_is_detected():
+    segments = vad.detect_speech(_clip(0.005, 0.00005), SAMPLE_RATE)
+    assert len(segments) == 1
+    assert segments[0]["start"] < 1.0 and segments[0]["end"] > 2.0
+
+def test_steady_noise_is_not_speech():
+    for level in (0.001, 0.01):
+        noise = np.random.default_rng(1).normal(0, level, 3 * SAMPLE_RATE).astype(np.float32)
+        assert vad.detect_speech(noise, SAMPLE_RATE) == []
+
+def test_speech_over_loud_noise_is_bounded():
+    segments = vad.detect_speech(_clip(0.5, 0.03), SAMPLE_RATE)
+    assert len(segments) == 1
+    assert segments[0]["start"] > 0.5 and segments[0]["end"] < 2.5
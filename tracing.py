@@ -0,0 +1,224 @@
+import contextvars
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_LOG_PATH = os.getenv("KRISHNA_TRACE_LOG", os.path.join(tempfile.gettempdir(), "krishna_traces.jsonl"))
+METRICS_PORT = int(os.getenv("KRISHNA_METRICS_PORT", "0"))
+HISTOGRAM_WINDOW = int(os.getenv("KRISHNA_TRACE_WINDOW", "1000"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current = contextvars.ContextVar("krishna_trace", default=None)
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_log_lock = threading.Lock()
+
+class Trace:
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.calls = []
+        self.duration = None
+        self._lock = threading.Lock()
+
+    def add_span(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def add_llm_call(self, prompt_tokens, output_tokens, cached_tokens=0):
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            self.cached_tokens += cached_tokens
+            self.calls.append({
+                "offset": time.perf_counter() - self.origin,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "output_tokens": output_tokens
+            })
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "name": self.name,
+                "started": self.started,
+                "duration": self.duration,
+                "llm_calls": self.llm_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "cached_tokens": self.cached_tokens,
+                "calls": list(self.calls),
+                "spans": list(self.spans)
+            }
+
+def observe(name, value):
+    with _lock:
+        _histograms.setdefault(name, deque(maxlen=HISTOGRAM_WINDOW)).append(value)
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def current_trace():
+    return _current.get()
+
+def attach(trace):
+    return _current.set(trace)
+
+def detach(token):
+    _current.reset(token)
+
+def start_trace(name="utterance"):
+    trace = Trace(name)
+    token = _current.set(trace)
+    return trace, token
+
+def end_trace(trace, token=None):
+    trace.duration = time.perf_counter() - trace.origin
+    if token is not None:
+        _current.reset(token)
+    observe("request.total", trace.duration)
+    observe("request.llm_calls", trace.llm_calls)
+    observe("request.tokens", trace.prompt_tokens + trace.output_tokens)
+    increment("requests_total")
+    _write(trace.to_dict())
+    return trace
+
+@contextmanager
+def trace(name="utterance"):
+    active, token = start_trace(name)
+    try:
+        yield active
+    finally:
+        end_trace(active, token)
+
+@contextmanager
+def span(name, **attributes):
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        observe(name, duration)
+        active = _current.get()
+        if active is not None:
+            record = {"name": name, "offset": started - active.origin, "duration": duration}
+            if attributes:
+                record["attributes"] = attributes
+            if error:
+                record["error"] = error
+            active.add_span(record)
+
+def record_llm_call(response):
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = int(getattr(usage, "prompt_token_count", 0) or 0)
+    output_tokens = int(getattr(usage, "candidates_token_count", 0) or 0)
+    cached_tokens = int(getattr(usage, "cached_content_token_count", 0) or 0)
+    increment("llm_calls_total")
+    increment("llm_prompt_tokens_total", prompt_tokens)
+    increment("llm_output_tokens_total", output_tokens)
+    increment("llm_cached_tokens_total", cached_tokens)
+    observe("llm.prompt_tokens", prompt_tokens)
+    observe("llm.cached_tokens", cached_tokens)
+    active = _current.get()
+    if active is not None:
+        active.add_llm_call(prompt_tokens, output_tokens, cached_tokens)
+
+def wrap(fn):
+    context = contextvars.copy_context()
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+def _write(record):
+    if not TRACE_LOG_PATH:
+        return
+    line = json.dumps(record, ensure_ascii=False)
+    try:
+        with _log_lock, open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass
+
+def _quantile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def snapshot():
+    with _lock:
+        histograms = {name: sorted(values) for name, values in _histograms.items()}
+        counters = dict(_counters)
+    summary = {}
+    for name, values in histograms.items():
+        if not values:
+            continue
+        summary[name] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            **{f"p{int(q * 100)}": _quantile(values, q) for q in QUANTILES}
+        }
+    return {"histograms": summary, "counters": counters}
+
+def _metric_name(name):
+    return "krishna_" + "".join(c if c.isalnum() else "_" for c in name)
+
+def prometheus_text():
+    data = snapshot()
+    lines = []
+    for name, stats in sorted(data["histograms"].items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} summary")
+        for q in QUANTILES:
+            lines.append(f'{metric}{{quantile="{q}"}} {stats[f"p{int(q * 100)}"]}')
+        lines.append(f"{metric}_sum {stats['mean'] * stats['count']}")
+        lines.append(f"{metric}_count {stats['count']}")
+    for name, value in sorted(data["counters"].items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+
+def serve_metrics(port=METRICS_PORT, host="0.0.0.0"):
+    global _server
+    with _lock:
+        if _server is None and port:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
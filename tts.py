@@ -1,37 +1,194 @@
-import requests
+import glob
 import os
+import re
 import tempfile
+import time
 import uuid
-import streamlit as st
+import tracing
+from call_scheduler import PRIORITY_BACKGROUND, PRIORITY_RESPONSE
+from clients import elevenlabs_scheduler, get_http_session, get_secret
+from tts_cache import TTSCache, cache_key, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
 
 voice_id = "gO8Kb3hHPEPElVxVHDwT"
 
-def speak(text, output=None):
-    if output is None:
-        temp_dir = tempfile.gettempdir()
-        unique_id = str(uuid.uuid4())
-        output = os.path.join(temp_dir, f"krishna_{unique_id}.mp3")
-    if os.path.exists(output):
-        base, ext = os.path.splitext(output)
-        unique_id = str(uuid.uuid4())
-        output = f"{base}_{unique_id}{ext}"
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+API_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io").rstrip("/")
+
+MODEL_ID = "eleven_multilingual_v2"
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.85
+}
+STREAM_CHUNK_SIZE = 4096
+OUTPUT_FORMAT = os.getenv("KRISHNA_TTS_OUTPUT_FORMAT", "mp3_44100_128")
+MOBILE_OUTPUT_FORMAT = os.getenv("KRISHNA_TTS_MOBILE_OUTPUT_FORMAT", "mp3_22050_32")
+GENERATED_FILE_TTL = float(os.getenv("KRISHNA_TTS_FILE_TTL", "600"))
+GENERATED_FILE_LIMIT = int(os.getenv("KRISHNA_TTS_FILE_LIMIT", "200"))
+GENERATED_DIR = os.getenv("KRISHNA_TTS_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "krishna_tts_output"))
+GENERATED_FILE_RE = re.compile(r"^krishna_[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[a-z0-9]+$")
+MIME_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "pcm": "audio/L16",
+    "ulaw": "audio/basic"
+}
+FILE_EXTENSIONS = {
+    "mp3": ".mp3",
+    "opus": ".ogg",
+    "pcm": ".pcm",
+    "ulaw": ".ulaw"
+}
+
+cache = TTSCache(
+    directory=os.getenv("KRISHNA_TTS_CACHE_DIR", DEFAULT_CACHE_DIR),
+    max_bytes=int(os.getenv("KRISHNA_TTS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    suffix=".audio",
+    legacy_suffixes=(".mp3",)
+)
+
+def _codec(output_format):
+    return (output_format or OUTPUT_FORMAT).split("_", 1)[0]
+
+def mime_type(output_format=None):
+    return MIME_TYPES.get(_codec(output_format), "application/octet-stream")
+
+def file_extension(output_format=None):
+    return FILE_EXTENSIONS.get(_codec(output_format), ".bin")
+
+def audio_duration(data, output_format=None):
+    parts = (output_format or OUTPUT_FORMAT).split("_")
+    try:
+        if parts[0] in ("mp3", "opus") and len(parts) > 2:
+            return len(data) * 8 / (int(parts[2]) * 1000)
+        if parts[0] == "pcm":
+            return len(data) / (2 * int(parts[1]))
+        if parts[0] == "ulaw":
+            return len(data) / int(parts[1])
+    except (IndexError, ValueError):
+        pass
+    return None
+
+def _cache_key(text, output_format):
+    return cache_key(text, voice_id, MODEL_ID, VOICE_SETTINGS, output_format)
+
+def _request_args(text, output_format):
     headers = {
-        "xi-api-key": st.secrets["ELEVEN_API_KEY"],
+        "xi-api-key": get_secret("ELEVEN_API_KEY"),
         "Content-Type": "application/json"
     }
     data = {
         "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.85
-        }
+        "model_id": MODEL_ID,
+        "voice_settings": VOICE_SETTINGS
     }
-    r = requests.post(url, json=data, headers=headers)
-    r.raise_for_status()
+    params = {"output_format": output_format}
+    return headers, data, params
+
+def _post(url, text, output_format, stream=False):
+    headers, data, params = _request_args(text, output_format)
+    r = get_http_session().post(url, json=data, headers=headers, params=params, stream=stream)
+    try:
+        r.raise_for_status()
+    except Exception:
+        r.close()
+        raise
+    return r
+
+def _fetch_audio(text, output_format, priority=PRIORITY_RESPONSE):
+    url = f"{API_BASE_URL}/v1/text-to-speech/{voice_id}"
+    return elevenlabs_scheduler.call(
+        lambda: _post(url, text, output_format).content,
+        key=_cache_key(text, output_format),
+        priority=priority
+    )
+
+def speak_bytes(text, output_format=None):
+    output_format = output_format or OUTPUT_FORMAT
+    key = _cache_key(text, output_format)
+    with tracing.span("tts.synthesize") as attributes:
+        audio_bytes = cache.get(key)
+        attributes["cache"] = "hit" if audio_bytes is not None else "miss"
+        if audio_bytes is None:
+            audio_bytes = _fetch_audio(text, output_format)
+            cache.put(key, audio_bytes)
+    if not audio_bytes:
+        raise RuntimeError("Failed to generate audio")
+    return audio_bytes
+
+def cleanup_generated_files(directory=None, max_age=GENERATED_FILE_TTL, max_files=GENERATED_FILE_LIMIT):
+    directory = directory or GENERATED_DIR
+    entries = []
+    for path in glob.glob(os.path.join(directory, "krishna_*.*")):
+        if not GENERATED_FILE_RE.match(os.path.basename(path)):
+            continue
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    cutoff = time.time() - max_age
+    removed = 0
+    for index, (modified, path) in enumerate(entries):
+        if index >= max_files or modified < cutoff:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+def speak(text, output=None, output_format=None):
+    output_format = output_format or OUTPUT_FORMAT
+    cleanup_generated_files()
+    if output is None:
+        os.makedirs(GENERATED_DIR, exist_ok=True)
+        unique_id = str(uuid.uuid4())
+        output = os.path.join(GENERATED_DIR, f"krishna_{unique_id}{file_extension(output_format)}")
+    if os.path.exists(output):
+        base, ext = os.path.splitext(output)
+        unique_id = str(uuid.uuid4())
+        output = f"{base}_{unique_id}{ext}"
+    audio_bytes = speak_bytes(text, output_format)
     with open(output, "wb") as f:
-        f.write(r.content)
+        f.write(audio_bytes)
     if not os.path.exists(output) or os.path.getsize(output) == 0:
         raise RuntimeError("Failed to generate audio file")
     return output
+
+def speak_stream(text, chunk_size=STREAM_CHUNK_SIZE, output_format=None):
+    output_format = output_format or OUTPUT_FORMAT
+    key = _cache_key(text, output_format)
+    cached = cache.get(key)
+    if cached is not None:
+        tracing.increment("tts_cache_hits_total")
+        yield cached
+        return
+    started = time.perf_counter()
+    url = f"{API_BASE_URL}/v1/text-to-speech/{voice_id}/stream"
+    response = elevenlabs_scheduler.call(
+        lambda: _post(url, text, output_format, stream=True),
+        priority=PRIORITY_RESPONSE
+    )
+    with response as r:
+        chunks = []
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            if chunk:
+                if not chunks:
+                    tracing.observe("tts.first_chunk", time.perf_counter() - started)
+                chunks.append(chunk)
+                yield chunk
+    tracing.observe("tts.stream", time.perf_counter() - started)
+    cache.put(key, b"".join(chunks))
+
+def warm_cache(texts, output_formats=None):
+    warmed = 0
+    for output_format in output_formats or [OUTPUT_FORMAT]:
+        for text in texts:
+            key = _cache_key(text, output_format)
+            if key in cache:
+                continue
+            cache.put(key, _fetch_audio(text, output_format, priority=PRIORITY_BACKGROUND))
+            warmed += 1
+    return warmed
+
+def cache_stats():
+    return cache.stats()
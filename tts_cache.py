@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "krishna_tts_cache")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+def cache_key(text, voice_id, model_id, voice_settings, output_format=None):
+    payload = json.dumps(
+        {
+            "text": text,
+            "voice_id": voice_id,
+            "model_id": model_id,
+            "voice_settings": voice_settings,
+            "output_format": output_format
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class TTSCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, suffix=".mp3", legacy_suffixes=()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.legacy_suffixes = tuple(legacy for legacy in legacy_suffixes if legacy != suffix)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _load_index(self):
+        found = []
+        for name in os.listdir(self.directory):
+            if self.legacy_suffixes and name.endswith(self.legacy_suffixes):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                continue
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                self.total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        if not data or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes
+            }
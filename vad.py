@@ -0,0 +1,98 @@
+import numpy as np
+
+FRAME_MS = 30
+HOP_MS = 10
+ABSOLUTE_FLOOR_DB = -70.0
+MIN_SNR_DB = 6.0
+NOISE_MARGIN_DB = 12.0
+DYNAMIC_RANGE_DB = 25.0
+NOISE_PERCENTILE = 10
+ZCR_THRESHOLD = 0.25
+ZCR_ENERGY_SLACK_DB = 8.0
+MIN_SPEECH_MS = 120
+MIN_SILENCE_MS = 300
+PADDING_MS = 200
+
+def _frames(audio, frame_length, hop_length):
+    if len(audio) < frame_length:
+        audio = np.pad(audio, (0, frame_length - len(audio)))
+    return np.lib.stride_tricks.sliding_window_view(audio, frame_length)[::hop_length]
+
+def frame_features(audio, sample_rate):
+    frame_length = int(sample_rate * FRAME_MS / 1000)
+    hop_length = int(sample_rate * HOP_MS / 1000)
+    frames = _frames(np.asarray(audio, dtype=np.float32), frame_length, hop_length)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return energy_db, zcr, hop_length
+
+def _runs(mask):
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def detect_speech(audio, sample_rate):
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.size == 0:
+        return []
+    energy_db, zcr, hop_length = frame_features(audio, sample_rate)
+    noise_floor = np.percentile(energy_db, NOISE_PERCENTILE)
+    floor = max(ABSOLUTE_FLOOR_DB, noise_floor + MIN_SNR_DB)
+    threshold = max(floor, min(noise_floor + NOISE_MARGIN_DB, energy_db.max() - DYNAMIC_RANGE_DB))
+    speech = (energy_db > threshold) | ((energy_db > threshold - ZCR_ENERGY_SLACK_DB) & (zcr > ZCR_THRESHOLD) & (energy_db > floor))
+    starts, ends = _runs(speech)
+    if starts.size == 0:
+        return []
+    frames_per_ms = 1.0 / HOP_MS
+    min_silence = int(MIN_SILENCE_MS * frames_per_ms)
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] >= min_silence))
+    merged_starts = starts[keep]
+    merged_ends = np.maximum.reduceat(ends, np.flatnonzero(keep))
+    long_enough = merged_ends - merged_starts >= int(MIN_SPEECH_MS * frames_per_ms)
+    merged_starts, merged_ends = merged_starts[long_enough], merged_ends[long_enough]
+    padding = int(sample_rate * PADDING_MS / 1000)
+    frame_length = int(sample_rate * FRAME_MS / 1000)
+    segments = []
+    for start, end in zip(merged_starts, merged_ends):
+        start_sample = max(0, int(start) * hop_length - padding)
+        end_sample = min(len(audio), (int(end) - 1) * hop_length + frame_length + padding)
+        if segments and start_sample <= segments[-1]["end_sample"]:
+            segments[-1]["end_sample"] = end_sample
+        else:
+            segments.append({"start_sample": start_sample, "end_sample": end_sample})
+    for segment in segments:
+        segment["start"] = segment["start_sample"] / sample_rate
+        segment["end"] = segment["end_sample"] / sample_rate
+    return segments
+
+def trim(audio, segments):
+    if not segments:
+        return audio[:0]
+    return audio[segments[0]["start_sample"]:segments[-1]["end_sample"]]
+
+CUT_SEARCH_SECONDS = 2.0
+
+def _quietest_cut(audio, low, high, sample_rate):
+    region = audio[low:high]
+    energy_db, _, hop_length = frame_features(region, sample_rate)
+    frame_length = int(sample_rate * FRAME_MS / 1000)
+    return min(high, low + int(np.argmin(energy_db)) * hop_length + frame_length // 2)
+
+def split_windows(audio, segments, sample_rate, max_seconds):
+    max_samples = int(max_seconds * sample_rate)
+    search = min(max_samples // 2, int(CUT_SEARCH_SECONDS * sample_rate))
+    pieces = []
+    for segment in segments:
+        start, end = segment["start_sample"], segment["end_sample"]
+        while end - start > max_samples:
+            cut = _quietest_cut(audio, start + max_samples - search, start + max_samples, sample_rate)
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+    windows = []
+    for start, end in pieces:
+        if windows and end - windows[-1][0] <= max_samples:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+    return windows
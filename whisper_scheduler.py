@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+import torch
+import whisper
+import tracing
+
+MAX_BATCH_SIZE = 8
+MAX_WAIT_MS = 30
+
+class _Request:
+    __slots__ = ("mel", "prompt", "future", "enqueued")
+
+    def __init__(self, mel, prompt):
+        self.mel = mel
+        self.prompt = prompt
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class InferenceScheduler:
+    def __init__(self, model_getter, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, beam_size=5, lock=None):
+        self.model_getter = model_getter
+        self.model_lock = lock or threading.Lock()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.beam_size = beam_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._batches = 0
+        self._queue_wait_total = 0.0
+        self._decode_total = 0.0
+        self._worker = threading.Thread(target=self._run, name="whisper-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, audio, prompt=None):
+        model = self.model_getter()
+        n_mels = getattr(model.dims, "n_mels", 80)
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels)
+        request = _Request(mel, prompt)
+        self._queue.put(request)
+        return request.future
+
+    def transcribe(self, audio, prompt=None):
+        return self.submit(audio, prompt).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.prompt, []).append(request)
+            for prompt, requests in groups.items():
+                self._decode(prompt, requests)
+
+    def _decode(self, prompt, requests):
+        started = time.perf_counter()
+        try:
+            model = self.model_getter()
+            mels = torch.stack([request.mel for request in requests]).to(model.device)
+            options = whisper.DecodingOptions(
+                task="transcribe",
+                language=None,
+                prompt=prompt,
+                temperature=0.0,
+                beam_size=self.beam_size,
+                fp16=model.device.type == "cuda"
+            )
+            with self.model_lock, torch.no_grad():
+                results = whisper.decode(model, mels, options)
+            for request, result in zip(requests, results):
+                request.future.set_result(result.text.strip())
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finished = time.perf_counter()
+        tracing.observe("stt.batch_size", len(requests))
+        tracing.observe("stt.batch_decode", finished - started)
+        for request in requests:
+            tracing.observe("stt.queue_wait", started - request.enqueued)
+        with self._lock:
+            self._batch_sizes[len(requests)] += 1
+            self._batches += 1
+            self._requests += len(requests)
+            self._queue_wait_total += sum(started - request.enqueued for request in requests)
+            self._decode_total += finished - started
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "requests": self._requests,
+                "batches": self._batches,
+                "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "mean_queue_wait_seconds": self._queue_wait_total / self._requests if self._requests else 0.0,
+                "mean_batch_decode_seconds": self._decode_total / self._batches if self._batches else 0.0
+            }